@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-container DOM extraction vs single-evaluate extraction
+Loads a saved Instagram comments page in Chromium and times both paths
+
+Usage:
+  uv run python benchmark_dom_extraction.py [--runs 5] [--fixture fixtures/instagram_comments_page.html]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from comment_capture import EXTRACT_COMMENTS_JS, comments_from_dom_rows, extract_mentions, to_participants
+
+DEFAULT_FIXTURE = Path(__file__).parent / "fixtures" / "instagram_comments_page.html"
+
+
+async def per_container_extract(page, owner_username: str = ''):
+    """The previous DOM path: several awaited browser calls per container"""
+    comment_containers = []
+    for selector in ['ul ul li', 'article ul li', 'div[role="button"]']:
+        containers = await page.query_selector_all(selector)
+        if len(containers) > len(comment_containers):
+            comment_containers = containers
+            break
+
+    comments = []
+    seen_usernames = set()
+    for container in comment_containers:
+        author_link = await container.query_selector('a[href^="/"][role="link"]')
+        if not author_link:
+            continue
+
+        href = await author_link.get_attribute('href')
+        if not href or href == '/' or '/p/' in href or '/reel/' in href:
+            continue
+
+        username = href.strip('/').split('/')[0]
+        if not username or username in seen_usernames or username == owner_username:
+            continue
+
+        text_content = await container.text_content()
+        if not text_content or len(text_content.strip()) < 3:
+            continue
+
+        mentions = extract_mentions(text_content)
+        if mentions:
+            comments.append({'username': username, 'tagged_users': mentions})
+            seen_usernames.add(username)
+    return comments
+
+
+async def single_evaluate_extract(page, owner_username: str = ''):
+    """The current DOM path: one evaluate, parsing in Python"""
+    rows = await page.evaluate(EXTRACT_COMMENTS_JS)
+    comments, _ = comments_from_dom_rows(rows)
+    return to_participants(comments, owner_username)
+
+
+async def time_path(page, extract, runs: int):
+    timings = []
+    result = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await extract(page)
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings), result
+
+
+async def run(fixture: Path, runs: int):
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        print("❌ Playwright not installed! Run: uv sync && uv run playwright install chromium")
+        return 1
+
+    html = fixture.read_text(encoding="utf-8")
+    print(f"📄 Fixture: {fixture} ({len(html) / 1024:.0f} KB)")
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(html)
+
+        legacy_best, legacy_avg, legacy = await time_path(page, per_container_extract, runs)
+        bulk_best, bulk_avg, bulk = await time_path(page, single_evaluate_extract, runs)
+        await browser.close()
+
+    print("=" * 60)
+    print(f"{'path':<20}{'best (ms)':>12}{'avg (ms)':>12}{'participants':>14}")
+    print(f"{'per-container':<20}{legacy_best * 1000:>12.1f}{legacy_avg * 1000:>12.1f}{len(legacy):>14}")
+    print(f"{'single evaluate':<20}{bulk_best * 1000:>12.1f}{bulk_avg * 1000:>12.1f}{len(bulk):>14}")
+    print("=" * 60)
+    print(f"⚡ Speedup: {legacy_best / bulk_best:.1f}x")
+
+    same = (
+        [(c['username'], sorted(c['tagged_users'])) for c in legacy]
+        == [(c['username'], sorted(c['tagged_users'])) for c in bulk]
+    )
+    print("✅ Both paths extracted the same participants" if same else "❌ Paths disagree!")
+    return 0 if same else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixture", type=Path, default=DEFAULT_FIXTURE)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.fixture, args.runs)))
+
+
+if __name__ == "__main__":
+    main()
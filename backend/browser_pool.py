@@ -0,0 +1,168 @@
+"""
+Pool of warm Chromium contexts for scraping
+Each slot runs a persistent context on its own copy of the logged-in profile
+(browser_data), so scrapes skip browser startup and several raffles can scrape
+at once without fighting over the profile's SingletonLock
+Playwright objects belong to the event loop that created them: lease from one loop
+"""
+
+import asyncio
+import os
+import shutil
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Optional
+
+BACKEND_DIR = Path(__file__).parent
+BASE_PROFILE_DIR = BACKEND_DIR / "browser_data"  # Logged-in profile (see setup_instagram_login.py)
+POOL_DIR = BACKEND_DIR / "browser_pool"
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "20"))
+# Server-side browsers run headless; a visible window (and DevTools) is an explicit opt-in for debugging
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").lower() == "true"
+BROWSER_DEVTOOLS = os.getenv("BROWSER_DEVTOOLS", "false").lower() == "true"
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Lock files and caches are not copied into the slot profiles
+PROFILE_IGNORE = shutil.ignore_patterns(
+    "Singleton*", "lockfile", "*.lock",
+    "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache", "GraphiteDawnCache"
+)
+
+
+def context_options(headless: bool, devtools: bool = BROWSER_DEVTOOLS) -> dict:
+    """launch_persistent_context arguments shared by the pool and the login browser"""
+    args = [
+        '--disable-blink-features=AutomationControlled',
+        '--disable-dev-shm-usage',
+        '--no-sandbox'
+    ]
+    # DevTools only opens in a visible browser, and only when asked for
+    devtools = devtools and not headless
+    if devtools:
+        args.append('--auto-open-devtools-for-tabs')
+
+    return {
+        'headless': headless,
+        'viewport': {'width': 1920, 'height': 1080},
+        'user_agent': USER_AGENT,
+        'args': args,
+        'devtools': devtools
+    }
+
+
+class BrowserSlot:
+    def __init__(self, index: int):
+        self.index = index
+        self.profile_dir = POOL_DIR / f"slot-{index}"
+        self.context = None
+        self.uses = 0
+
+
+class BrowserPool:
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_uses: int = BROWSER_MAX_USES, headless: bool = BROWSER_HEADLESS):
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.slots: List[BrowserSlot] = [BrowserSlot(index) for index in range(size)]
+        self.idle: Optional[asyncio.Queue] = None
+        self.playwright = None
+        self.leases = 0
+        self.launches = 0
+
+    async def _start(self):
+        if self.idle is None:
+            self.idle = asyncio.Queue()
+            for slot in self.slots:
+                self.idle.put_nowait(slot)
+
+        if self.playwright is None:
+            from playwright.async_api import async_playwright
+            self.playwright = await async_playwright().start()
+
+    def _clone_profile(self, slot: BrowserSlot):
+        """Fresh copy of the logged-in profile for a slot"""
+        shutil.rmtree(slot.profile_dir, ignore_errors=True)
+        if BASE_PROFILE_DIR.exists():
+            shutil.copytree(BASE_PROFILE_DIR, slot.profile_dir, ignore=PROFILE_IGNORE)
+        else:
+            slot.profile_dir.mkdir(parents=True, exist_ok=True)
+
+    async def _open(self, slot: BrowserSlot):
+        await asyncio.to_thread(self._clone_profile, slot)
+        try:
+            slot.context = await self.playwright.chromium.launch_persistent_context(
+                user_data_dir=str(slot.profile_dir),
+                **context_options(self.headless)
+            )
+        except Exception as e:
+            if "Executable doesn't exist" in str(e):
+                raise Exception(
+                    "❌ Playwright browsers not installed!\n\n"
+                    "Please run the following command to install:\n"
+                    "  cd backend\n"
+                    "  uv run playwright install chromium\n\n"
+                    f"Original error: {e}"
+                )
+            raise
+        slot.uses = 0
+        self.launches += 1
+        print(f"🌐 Navegador {slot.index} pronto")
+
+    async def _close(self, slot: BrowserSlot):
+        if slot.context is not None:
+            try:
+                await slot.context.close()
+            except Exception as e:
+                print(f"⚠️  Error closing browser {slot.index}: {e}")
+            slot.context = None
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Borrow a warm browser context, waiting for a free slot
+        The context is recycled after max_uses leases or when the scrape using it fails
+        """
+        await self._start()
+        slot = await self.idle.get()
+        try:
+            if slot.context is None:
+                await self._open(slot)
+            slot.uses += 1
+            self.leases += 1
+
+            try:
+                yield slot.context
+            except BaseException:
+                # The browser may be left in a bad state (crashed, stuck dialog...)
+                await self._close(slot)
+                raise
+
+            if slot.uses >= self.max_uses:
+                print(f"♻️  Reciclando navegador {slot.index} após {slot.uses} usos")
+                await self._close(slot)
+        finally:
+            self.idle.put_nowait(slot)
+
+    async def close(self):
+        """Close every warm context and stop Playwright"""
+        for slot in self.slots:
+            await self._close(slot)
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "warm": sum(1 for slot in self.slots if slot.context is not None),
+            "idle": self.idle.qsize() if self.idle else self.size,
+            "leases": self.leases,
+            "launches": self.launches
+        }
+
+
+# Singleton instance
+browser_pool = BrowserPool()
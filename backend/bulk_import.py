@@ -0,0 +1,233 @@
+"""
+Bulk write helpers for large raffle loads
+Validates rows with set-based queries and inserts them in chunked executemany batches
+"""
+
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, List, Set, Tuple
+
+from sqlalchemy import DateTime, false, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from models import Participant, Raffle, Ticket, InstagramRaffle, InstagramParticipant
+from schemas import ParticipantCreate, TicketAssignment
+from database import insert_ignore
+from draw_audit import record_entries, ticket_entry
+
+# Rows sent per executemany INSERT
+BATCH_SIZE = 5000
+
+# SQLite limits bound parameters per statement, keep IN (...) lists below it
+IN_CLAUSE_SIZE = 900
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yield successive lists of at most `size` items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalize_username(username: str) -> str:
+    """Canonical Instagram username: lowercase, without @ or surrounding spaces"""
+    return username.strip().lstrip("@").lower()
+
+
+def find_missing_participants(db: Session, participant_ids: Iterable[int]) -> Set[int]:
+    """Return the participant ids that do not exist in the database"""
+    wanted = set(participant_ids)
+    found = set()
+    for chunk in chunked(wanted, IN_CLAUSE_SIZE):
+        found.update(db.scalars(select(Participant.id).where(Participant.id.in_(chunk))))
+    return wanted - found
+
+
+def find_taken_ticket_numbers(db: Session, raffle_id: int, ticket_numbers: Iterable[str]) -> Set[str]:
+    """Return the ticket numbers already assigned in a raffle"""
+    taken = set()
+    for chunk in chunked(set(ticket_numbers), IN_CLAUSE_SIZE):
+        taken.update(db.scalars(
+            select(Ticket.ticket_number).where(
+                Ticket.raffle_id == raffle_id,
+                Ticket.ticket_number.in_(chunk)
+            )
+        ))
+    return taken
+
+
+def insert_tickets(db: Session, raffle: Raffle, assignments: Iterable, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Insert already validated ticket assignments, returns the number of rows written
+    The raffle's entries digest is updated alongside, so nothing has to be re-read later
+    """
+    inserted = 0
+    for chunk in chunked(assignments, batch_size):
+        db.execute(insert(Ticket), [
+            {
+                "ticket_number": assignment.ticket_number,
+                "participant_id": assignment.participant_id,
+                "raffle_id": raffle.id,
+            }
+            for assignment in chunk
+        ])
+        record_entries(db, raffle, (
+            ticket_entry(assignment.participant_id, assignment.ticket_number) for assignment in chunk
+        ))
+        inserted += len(chunk)
+    return inserted
+
+
+def next_clone_number(db: Session, model, root_id: int) -> int:
+    """Number of the next copy in a raffle lineage (indexed clone_root_id count)"""
+    return db.scalar(select(func.count()).select_from(model).where(model.clone_root_id == root_id)) + 1
+
+
+def copy_tickets(db: Session, source_raffle_id: int, target_raffle_id: int) -> int:
+    """Copy every ticket of a raffle into another with one INSERT ... SELECT, winners reset"""
+    result = db.execute(insert(Ticket).from_select(
+        ["ticket_number", "participant_id", "raffle_id", "is_winner", "created_at"],
+        select(
+            Ticket.ticket_number,
+            Ticket.participant_id,
+            literal(target_raffle_id),
+            false(),
+            literal(datetime.utcnow(), DateTime)
+        ).where(Ticket.raffle_id == source_raffle_id)
+    ))
+    return result.rowcount
+
+
+def copy_instagram_participants(db: Session, source_raffle_id: int, target_raffle_id: int) -> int:
+    """Copy every participant (and validation result) of an Instagram raffle with one INSERT ... SELECT"""
+    copied = (
+        InstagramParticipant.username,
+        InstagramParticipant.comment_text,
+        InstagramParticipant.tagged_users,
+        InstagramParticipant.comment_timestamp,
+        InstagramParticipant.is_validated,
+        InstagramParticipant.is_valid,
+        InstagramParticipant.validation_errors,
+        InstagramParticipant.profile_public,
+        InstagramParticipant.follows_required
+    )
+    result = db.execute(insert(InstagramParticipant).from_select(
+        [column.key for column in copied] + ["raffle_id", "is_winner", "created_at"],
+        select(
+            *copied,
+            literal(target_raffle_id),
+            false(),
+            literal(datetime.utcnow(), DateTime)
+        ).where(InstagramParticipant.raffle_id == source_raffle_id)
+    ))
+    return result.rowcount
+
+
+def write_participant_batch(db: Session, rows: List[Tuple[int, ParticipantCreate]]) -> Tuple[int, int, List[Tuple[int, str]]]:
+    """
+    Insert one batch of imported participants and commit it
+    Emails already registered (or repeated in the batch) are skipped
+    """
+    existing = set()
+    for chunk in chunked({row.email for _, row in rows}, IN_CLAUSE_SIZE):
+        existing.update(db.scalars(select(Participant.email).where(Participant.email.in_(chunk))))
+    
+    new_rows = []
+    for _, row in rows:
+        if row.email in existing:
+            continue
+        existing.add(row.email)
+        new_rows.append(row.model_dump())
+    
+    if new_rows:
+        db.execute(insert(Participant), new_rows)
+    db.commit()
+    return len(new_rows), len(rows) - len(new_rows), []
+
+
+def write_ticket_batch(db: Session, raffle_id: int, rows: List[Tuple[int, TicketAssignment]]) -> Tuple[int, int, List[Tuple[int, str]]]:
+    """
+    Insert one batch of imported tickets and commit it
+    Rows pointing at unknown participants are rejected, ticket numbers already taken are skipped
+    """
+    missing = find_missing_participants(db, (row.participant_id for _, row in rows))
+    taken = find_taken_ticket_numbers(db, raffle_id, (row.ticket_number for _, row in rows))
+    
+    errors = []
+    new_rows = []
+    skipped = 0
+    for line_num, row in rows:
+        if row.participant_id in missing:
+            errors.append((line_num, f"Participant {row.participant_id} not found"))
+            continue
+        if row.ticket_number in taken:
+            skipped += 1
+            continue
+        taken.add(row.ticket_number)
+        new_rows.append(row)
+    
+    inserted = insert_tickets(db, db.get(Raffle, raffle_id), new_rows)
+    if inserted:
+        db.get(Raffle, raffle_id).status = "active"
+    db.commit()
+    return inserted, skipped, errors
+
+
+def insert_instagram_participants(db: Session, raffle: InstagramRaffle, comments: Iterable[dict], batch_size: int = BATCH_SIZE) -> int:
+    """
+    Append scraped comments as participants, keeping the first comment per username
+    Usernames are normalized (lowercase, no @) so "Foo" and "foo" are one entry. Each
+    chunk is written with INSERT ... ON CONFLICT DO NOTHING RETURNING (SQLAlchemy may
+    split it into several statements to stay under driver parameter limits): usernames
+    already in the raffle are skipped by the unique index, and only the rows actually
+    written are folded into the entries digest; returns the number of rows written
+    """
+    inserted = 0
+    for chunk in chunked(comments, batch_size):
+        rows = {}
+        for comment in chunk:
+            username = normalize_username(comment['username'])
+            if username and username not in rows:
+                rows[username] = {
+                    "raffle_id": raffle.id,
+                    "username": username,
+                    "comment_text": comment['text'],
+                    "tagged_users": comment['tagged_users'],
+                    "comment_timestamp": comment.get('created_at')
+                }
+        written = db.scalars(
+            insert_ignore(InstagramParticipant).returning(InstagramParticipant.username),
+            list(rows.values())
+        ).all()
+        record_entries(db, raffle, written)
+        inserted += len(written)
+    return inserted
+
+
+def stream_instagram_participants(db: Session, raffle: InstagramRaffle, comments: Iterable[dict], batch_size: int = BATCH_SIZE) -> Tuple[int, int, int]:
+    """
+    Stream comments (e.g. FileBasedScraper.iter_comments) into a raffle, committing each chunk
+    Only one chunk is held in memory; returns (rows_read, inserted, batches)
+    """
+    rows_read = inserted = batches = 0
+    for chunk in chunked(comments, batch_size):
+        rows_read += len(chunk)
+        inserted += insert_instagram_participants(db, raffle, chunk, batch_size)
+        batches += 1
+        raffle.status = "validating"
+        db.commit()
+    return rows_read, inserted, batches
+
+
+def write_instagram_comment_batch(db: Session, raffle_id: int, comments: List[dict]) -> Tuple[int, int, List[Tuple[int, str]]]:
+    """
+    Insert one batch of imported comments as participants and commit it
+    Comments without mentions and usernames already in the raffle are skipped
+    """
+    raffle = db.get(InstagramRaffle, raffle_id)
+    inserted = insert_instagram_participants(db, raffle, (comment for comment in comments if comment['tagged_users']))
+    db.commit()
+    return inserted, len(comments) - inserted, []
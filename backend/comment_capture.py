@@ -0,0 +1,247 @@
+"""
+Comment capture from Instagram's own network responses
+Instead of reading comments back out of the DOM, the scraper listens to the
+GraphQL / API JSON the comments page loads and parses comment nodes directly
+"""
+
+import asyncio
+import json
+import re
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Responses that can carry comments
+COMMENT_RESPONSE_MARKERS = ("/graphql", "/api/v1/media/")
+
+MENTION_PATTERN = re.compile(r'@([a-zA-Z0-9._]+)')
+MAX_TEXT_LENGTH = 500
+
+# Comment JSON embedded in the first HTML response (no XHR is made for it)
+EMBEDDED_JSON_JS = '''
+    () => Array.from(document.querySelectorAll('script[type="application/json"]'))
+        .map(script => script.textContent)
+        .filter(text => text.includes('"text"'))
+'''
+
+# One-shot DOM fallback: all comment containers as plain JSON rows
+EXTRACT_COMMENTS_JS = '''
+    () => {
+        const selectors = ['ul ul li', 'article ul li', 'div[role="button"]'];
+        let containers = [];
+        for (const selector of selectors) {
+            const found = document.querySelectorAll(selector);
+            if (found.length > containers.length) {
+                containers = Array.from(found);
+                break;
+            }
+        }
+        return containers.map(container => {
+            const author = container.querySelector('a[href^="/"][role="link"]');
+            const permalink = container.querySelector('a[href*="/c/"]');
+            return {
+                href: author ? author.getAttribute('href') : null,
+                permalink: permalink ? permalink.getAttribute('href') : null,
+                text: container.textContent
+            };
+        });
+    }
+'''
+
+COMMENT_ID_PATTERN = re.compile(r'/c/(\d+)')
+
+
+def extract_mentions(text: str) -> List[str]:
+    """Unique @mentions of a comment"""
+    return list(set(MENTION_PATTERN.findall(text)))
+
+
+def is_comment_response(url: str) -> bool:
+    return any(marker in url for marker in COMMENT_RESPONSE_MARKERS)
+
+
+def iter_comment_nodes(payload) -> Iterator[Dict]:
+    """
+    Walk any Instagram JSON payload and yield comment nodes
+    Matches both GraphQL edges ({id, text, owner}) and API v1 comments
+    ({pk, text, user}), so it survives most response shape changes
+    """
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            author = node.get("user") or node.get("owner")
+            if (
+                isinstance(node.get("text"), str)
+                and isinstance(author, dict)
+                and author.get("username")
+                and (node.get("pk") or node.get("id"))
+            ):
+                yield node
+            # The post caption has the same shape as a comment
+            stack.extend(reversed([value for key, value in node.items() if key != "caption"]))
+
+
+def find_has_more(payload) -> Optional[bool]:
+    """Whether a comments response says more pages exist, None when it does not tell"""
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            page_info = node.get("page_info")
+            if isinstance(page_info, dict) and "has_next_page" in page_info:
+                return page_info.get("has_next_page")
+            if "has_more_comments" in node:
+                return node.get("has_more_comments")
+            stack.extend(node.values())
+    return None
+
+
+def comment_from_node(node: Dict) -> Dict:
+    author = node.get("user") or node.get("owner")
+    created_at = node.get("created_at")
+    text = node["text"].strip()
+    return {
+        'comment_id': str(node.get("pk") or node.get("id")),
+        'username': author["username"],
+        'text': text[:MAX_TEXT_LENGTH],
+        'created_at': datetime.fromtimestamp(created_at) if isinstance(created_at, (int, float)) else datetime.now(),
+        'likes': node.get("comment_like_count") or 0,
+        'tagged_users': extract_mentions(text)
+    }
+
+
+def comments_from_dom_rows(rows: Iterable[Dict], frontier: Set[str] = frozenset()) -> Tuple[List[Dict], bool]:
+    """
+    Turn EXTRACT_COMMENTS_JS rows into comments, in page order
+    Stops at the first comment of a previous run; returns (comments, reached_checkpoint)
+    """
+    comments = []
+    for row in rows:
+        match = COMMENT_ID_PATTERN.search(row.get('permalink') or '')
+        comment_id = match.group(1) if match else None
+        if comment_id and comment_id in frontier:
+            return comments, True
+
+        href = row.get('href')
+        if not href or href == '/' or '/p/' in href or '/reel/' in href:
+            continue
+        text = (row.get('text') or '').strip()
+        if len(text) < 3:
+            continue
+
+        comments.append({
+            'comment_id': comment_id,
+            'username': href.strip('/').split('/')[0],
+            'text': text[:MAX_TEXT_LENGTH],
+            'created_at': datetime.now(),
+            'likes': 0,
+            'tagged_users': extract_mentions(text)
+        })
+    return comments, False
+
+
+class ParticipantStream:
+    """
+    Turns comments into participants as they load: the first comment with
+    mentions per username, skipping the post owner
+    """
+
+    def __init__(self, owner_username: str = ''):
+        self.owner_username = owner_username
+        self.seen_usernames: Set[str] = set()
+        self.participants: List[Dict] = []
+
+    def add(self, comments: Iterable[Dict]) -> List[Dict]:
+        """Participants among `comments` not emitted before"""
+        new = []
+        for comment in comments:
+            username = comment['username']
+            if not username or username in self.seen_usernames or username == self.owner_username:
+                continue
+            # Only comments tagging someone take part in the raffle
+            if comment['tagged_users']:
+                new.append(comment)
+                self.seen_usernames.add(username)
+        self.participants.extend(new)
+        return new
+
+
+def to_participants(comments: Iterable[Dict], owner_username: str = '') -> List[Dict]:
+    """First comment with mentions per username, skipping the post owner"""
+    return ParticipantStream(owner_username).add(comments)
+
+
+class CommentCapture:
+    """Collects comments from a page's network responses while it scrolls"""
+
+    def __init__(self, frontier: Iterable[str] = ()):
+        self.frontier = set(frontier)
+        self.comments: Dict[str, Dict] = {}  # comment id -> comment, in arrival order
+        self.has_more: Optional[bool] = None
+        self.responses = 0  # Payloads that contained new comments
+        self.reached_checkpoint = False
+        self.first_comment = asyncio.Event()
+        self.pending: Set[asyncio.Task] = set()
+
+    @property
+    def count(self) -> int:
+        return len(self.comments)
+
+    def attach(self, page):
+        """Start listening; call before navigating to the comments page"""
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if not is_comment_response(response.url):
+            return
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        task = asyncio.ensure_future(self._read(response))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def _read(self, response):
+        try:
+            payload = await response.json()
+        except Exception:
+            return  # Not JSON (or body already gone)
+        self.add_payload(payload)
+
+    def add_payload(self, payload) -> int:
+        """Parse one JSON payload, returns how many new comments it had"""
+        added = 0
+        for node in iter_comment_nodes(payload):
+            comment = comment_from_node(node)
+            if comment['comment_id'] in self.frontier:
+                self.reached_checkpoint = True
+                continue
+            if comment['comment_id'] not in self.comments:
+                self.comments[comment['comment_id']] = comment
+                added += 1
+
+        if added:
+            self.responses += 1
+            self.first_comment.set()
+            has_more = find_has_more(payload)
+            if has_more is not None:
+                self.has_more = has_more
+        return added
+
+    async def add_embedded(self, page) -> int:
+        """Parse comment JSON embedded in the initial HTML"""
+        added = 0
+        for text in await page.evaluate(EMBEDDED_JSON_JS):
+            try:
+                added += self.add_payload(json.loads(text))
+            except ValueError:
+                continue
+        return added
+
+    async def drain(self):
+        """Wait for responses still being parsed"""
+        if self.pending:
+            await asyncio.gather(*list(self.pending), return_exceptions=True)
@@ -0,0 +1,144 @@
+"""
+Parser for comment dumps pasted from Instagram's comment list (e.g. backup.txt)
+Each comment is copied as:
+
+    Foto do perfil de <username>
+    <username>
+    (blank / badge lines)
+    <relative time, e.g. "11 h" or "3 d">
+    <comment text, possibly over several lines>
+
+A line-by-line state machine rebuilds (author, time, text, mentions) records
+in one pass, keeping only the comment being read in memory
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from comment_capture import MAX_TEXT_LENGTH, extract_mentions
+
+HEADER_PATTERN = re.compile(r"^(?:Foto do perfil de (?P<pt>\S+)|(?P<en>\S+)'s profile picture)$")
+RELATIVE_TIME_PATTERN = re.compile(r'^(\d+)\s*(s|min|m|h|d|sem|w|a|y)$')
+HIDDEN_MARKERS = {"Oculto pelo Instagram", "Hidden by Instagram"}
+UI_LINES = {"Responder", "Reply", "Ver tradução", "See translation", "Curtir", "Like"}
+
+TIME_UNITS = {
+    's': timedelta(seconds=1),
+    'min': timedelta(minutes=1),
+    'm': timedelta(minutes=1),
+    'h': timedelta(hours=1),
+    'd': timedelta(days=1),
+    'sem': timedelta(weeks=1),
+    'w': timedelta(weeks=1),
+    'a': timedelta(days=365),
+    'y': timedelta(days=365),
+}
+
+# Parser states
+SEEK_HEADER = "seek_header"
+AUTHOR = "author"
+TIME = "time"
+TEXT = "text"
+
+
+def parse_relative_time(value: str, reference: datetime) -> Optional[datetime]:
+    """Timestamp of an Instagram relative time ("11 h", "3 d") counted back from `reference`"""
+    match = RELATIVE_TIME_PATTERN.match(value.strip())
+    if not match:
+        return None
+    return reference - int(match.group(1)) * TIME_UNITS[match.group(2)]
+
+
+class CommentDumpParser:
+    """
+    Feed lines with feed(); complete comments are returned as soon as the next
+    one starts, call close() at the end for the last one
+    """
+
+    def __init__(self, reference: Optional[datetime] = None):
+        self.reference = reference or datetime.now()
+        self.state = SEEK_HEADER
+        self.line_num = 0
+        self.current: Optional[Dict] = None
+        self.text_lines: List[str] = []
+        self.hidden_next = False
+
+        self.comments = 0
+        self.hidden = 0
+        self.orphan_lines = 0  # Lines outside any comment (e.g. a record cut at the top of the paste)
+
+    def _start(self, username: str) -> Optional[Dict]:
+        finished = self._finish()
+        self.current = {
+            'username': username,
+            'relative_time': None,
+            'created_at': None,
+            'hidden': self.hidden_next,
+            'line': self.line_num
+        }
+        self.text_lines = []
+        self.hidden_next = False
+        self.state = AUTHOR
+        return finished
+
+    def _finish(self) -> Optional[Dict]:
+        """Complete the comment being read, None if it had no text"""
+        record, self.current = self.current, None
+        self.state = SEEK_HEADER
+        text = "\n".join(self.text_lines).strip()
+        self.text_lines = []
+        if not record or not record['username'] or not text:
+            return None
+
+        record['text'] = text[:MAX_TEXT_LENGTH]
+        record['tagged_users'] = extract_mentions(text)
+        record['likes'] = 0
+        self.comments += 1
+        if record['hidden']:
+            self.hidden += 1
+        return record
+
+    def feed(self, line: str) -> Optional[Dict]:
+        """Consume one line, returns the previous comment when this line starts a new one"""
+        self.line_num += 1
+        stripped = line.strip()
+
+        header = HEADER_PATTERN.match(stripped)
+        if header:
+            return self._start(header.group('pt') or header.group('en'))
+
+        if stripped in HIDDEN_MARKERS:
+            # Instagram lists hidden comments after this marker
+            finished = self._finish()
+            self.hidden_next = True
+            return finished
+
+        if self.state == SEEK_HEADER:
+            if stripped:
+                self.orphan_lines += 1
+        elif self.state == AUTHOR:
+            if stripped:
+                self.current['username'] = stripped.lstrip('@')
+                self.state = TIME
+        elif self.state == TIME:
+            created_at = parse_relative_time(stripped, self.reference)
+            if created_at:
+                self.current['relative_time'] = stripped
+                self.current['created_at'] = created_at
+                self.state = TEXT
+            # Anything else before the time is a badge ("Verificado", "Autor"...)
+        elif stripped not in UI_LINES:
+            self.text_lines.append(line.rstrip())
+        return None
+
+    def close(self) -> Optional[Dict]:
+        return self._finish()
+
+    def stats(self) -> Dict:
+        return {
+            "lines": self.line_num,
+            "comments": self.comments,
+            "hidden": self.hidden,
+            "orphan_lines": self.orphan_lines
+        }
@@ -0,0 +1,27 @@
+"""
+Shared pytest fixtures
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, apply_sqlite_pragmas, engine_options
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Session factory bound to a fresh SQLite database file"""
+    url = f"sqlite:///{tmp_path / 'raffle.db'}"
+    engine = create_engine(url, **engine_options(url))
+    apply_sqlite_pragmas(engine)
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
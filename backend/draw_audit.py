@@ -0,0 +1,194 @@
+"""
+Verifiable draws
+Each raffle commits to a server-side secret when it is created and keeps an
+order-independent digest of its entries, updated as entries are added. The draw
+seed is derived from the secret and the digest, so anyone holding the revealed
+secret can replay the draw and check the winners.
+"""
+
+import hashlib
+import random
+import secrets
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import DrawAuditLog, InstagramParticipant, Raffle, Ticket
+from schemas import DrawVerificationResponse
+
+# The digest is the sum of SHA-256 entry hashes modulo 2^256 (a multiset hash):
+# adding entries is O(new entries) and the result does not depend on insertion order
+DIGEST_MODULUS = 2 ** 256
+EMPTY_DIGEST = "0" * 64
+
+# Rows fetched per round-trip when recomputing a digest
+STREAM_BATCH_SIZE = 5000
+
+# Attempts at the guarded digest UPDATE before giving up on a busy raffle
+DIGEST_UPDATE_RETRIES = 20
+
+
+class RaffleCompleted(Exception):
+    """Entries were added to a raffle that has already been drawn"""
+
+
+def new_secret() -> Tuple[str, str]:
+    """Return a fresh (secret, commitment) pair"""
+    secret = secrets.token_hex(32)
+    return secret, commit_secret(secret)
+
+
+def commit_secret(secret: str) -> str:
+    """Public commitment to a draw secret"""
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+def ticket_entry(participant_id: int, ticket_number: str) -> str:
+    """Canonical digest entry for a ticket"""
+    return f"{participant_id}:{ticket_number}"
+
+
+def add_entries(digest: Optional[str], entries: Iterable[str]) -> Tuple[str, int]:
+    """Fold entries into a digest, returns (new_digest, entries_added)"""
+    total = int(digest or EMPTY_DIGEST, 16)
+    added = 0
+    for entry in entries:
+        total += int.from_bytes(hashlib.sha256(entry.encode("utf-8")).digest(), "big")
+        added += 1
+    return f"{total % DIGEST_MODULUS:064x}", added
+
+
+def combine_digests(first: str, second: str) -> str:
+    """Digest of the union of two entry sets"""
+    return f"{(int(first, 16) + int(second, 16)) % DIGEST_MODULUS:064x}"
+
+
+def compute_ticket_digest(db: Session, raffle_id: int) -> Tuple[str, int]:
+    """Recompute a ticket raffle digest in one streamed pass, returns (digest, count)"""
+    rows = db.execute(
+        select(Ticket.participant_id, Ticket.ticket_number)
+        .where(Ticket.raffle_id == raffle_id)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    return add_entries(EMPTY_DIGEST, (ticket_entry(*row) for row in rows))
+
+
+def compute_instagram_digest(db: Session, raffle_id: int) -> Tuple[str, int]:
+    """Recompute an Instagram raffle digest in one streamed pass, returns (digest, count)"""
+    usernames = db.execute(
+        select(InstagramParticipant.username)
+        .where(InstagramParticipant.raffle_id == raffle_id)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    ).scalars()
+    return add_entries(EMPTY_DIGEST, usernames)
+
+
+def record_entries(db: Session, raffle, entries: Iterable[str]):
+    """
+    Fold newly added entries into a raffle's stored digest
+    The entries must already be written in this transaction. The stored digest is
+    read back and replaced with a guarded UPDATE ... WHERE entries_digest = :old,
+    retried when another writer got there first, so concurrent imports, scrapes and
+    validations on one raffle never lose each other's entries. Raffles created
+    before digests existed are backfilled from the database instead
+    New entries on a drawn raffle raise RaffleCompleted, rolling back with the caller
+    """
+    model = type(raffle)
+    delta, added = add_entries(EMPTY_DIGEST, entries)
+    db.flush()
+    
+    for _ in range(DIGEST_UPDATE_RETRIES):
+        digest, count, status = db.execute(
+            select(model.entries_digest, model.entries_count, model.status).where(model.id == raffle.id)
+        ).one()
+        if added and status == "completed":
+            raise RaffleCompleted(f"Raffle {raffle.id} already completed")
+        if digest is None:
+            compute = compute_ticket_digest if isinstance(raffle, Raffle) else compute_instagram_digest
+            new_digest, new_count = compute(db, raffle.id)
+            current = model.entries_digest.is_(None)
+        else:
+            new_digest, new_count = combine_digests(digest, delta), (count or 0) + added
+            current = model.entries_digest == digest
+        
+        if added:
+            # The draw must not slip in between the check above and this write
+            current = current & (model.status != "completed")
+        result = db.execute(
+            update(model)
+            .where(model.id == raffle.id, current)
+            .values(entries_digest=new_digest, entries_count=new_count)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            set_committed_value(raffle, "entries_digest", new_digest)
+            set_committed_value(raffle, "entries_count", new_count)
+            return
+    
+    raise RuntimeError(f"Could not update the entries digest of raffle {raffle.id}: too many concurrent writers")
+
+
+def derive_seed(secret: str, digest: str, count: int) -> str:
+    """Draw seed bound to the committed secret and the exact entry set"""
+    return hashlib.sha256(f"{secret}:{digest}:{count}".encode("utf-8")).hexdigest()
+
+
+def seeded_rng(seed: str) -> random.Random:
+    """Deterministic generator for a draw seed"""
+    return random.Random(int(seed, 16))
+
+
+def prepare_draw(db: Session, raffle) -> random.Random:
+    """Fix the raffle's draw seed and return the generator the draw must use"""
+    if not raffle.draw_secret:
+        # Raffles created before verifiable draws get their secret at draw time
+        raffle.draw_secret, raffle.seed_commitment = new_secret()
+    # Re-read the stored digest so entries committed since the raffle was loaded count
+    record_entries(db, raffle, [])
+    
+    raffle.draw_seed = derive_seed(raffle.draw_secret, raffle.entries_digest, raffle.entries_count)
+    return seeded_rng(raffle.draw_seed)
+
+
+def latest_audit(db: Session, raffle_type: str, raffle_id: int) -> Optional[DrawAuditLog]:
+    """Most recent audit log entry for a raffle"""
+    return db.scalars(
+        select(DrawAuditLog)
+        .where(DrawAuditLog.raffle_type == raffle_type, DrawAuditLog.raffle_id == raffle_id)
+        .order_by(DrawAuditLog.id.desc())
+        .limit(1)
+    ).first()
+
+
+def build_verification(
+    raffle, 
+    audit: DrawAuditLog, 
+    recomputed_digest: str, 
+    recomputed_count: int, 
+    replayed_winner_ids: List[int]
+) -> DrawVerificationResponse:
+    """Compare a recorded draw with its replay"""
+    commitment_valid = commit_secret(raffle.draw_secret) == raffle.seed_commitment
+    digest_valid = (recomputed_digest, recomputed_count) == (audit.entries_digest, audit.entries_count)
+    seed_valid = derive_seed(raffle.draw_secret, recomputed_digest, recomputed_count) == audit.seed
+    winners_valid = replayed_winner_ids == audit.winner_ids
+    
+    return DrawVerificationResponse(
+        raffle_id=raffle.id,
+        seed_commitment=raffle.seed_commitment,
+        draw_secret=raffle.draw_secret,
+        draw_seed=audit.seed,
+        entries_digest=audit.entries_digest,
+        entries_count=audit.entries_count,
+        recomputed_digest=recomputed_digest,
+        recomputed_count=recomputed_count,
+        winner_ids=audit.winner_ids,
+        replayed_winner_ids=replayed_winner_ids,
+        commitment_valid=commitment_valid,
+        digest_valid=digest_valid,
+        seed_valid=seed_valid,
+        winners_valid=winners_valid,
+        verified=commitment_valid and digest_valid and seed_valid and winners_valid
+    )
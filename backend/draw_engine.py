@@ -0,0 +1,166 @@
+"""
+Winner selection that works directly on the database
+Counts the eligible rows and fetches only the selected ones, never the whole table
+"""
+
+import heapq
+import math
+import random
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import InstagramParticipant, Ticket
+
+# Rows fetched per round-trip when streaming ids or groups
+STREAM_BATCH_SIZE = 1000
+
+# Upper bound for winners in a single draw
+MAX_WINNERS = 1000
+
+
+def count_rows(db: Session, model, *criteria) -> int:
+    """Count rows of `model` matching the given filters"""
+    return db.scalar(select(func.count()).select_from(model).where(*criteria))
+
+
+def pick_random_row(db: Session, model, *criteria, rng: random.Random = random) -> Tuple[Optional[object], int]:
+    """
+    Pick one row uniformly at random among those matching the filters
+    Returns (row, eligible_count); row is None when nothing matches
+    """
+    total = count_rows(db, model, *criteria)
+    if not total:
+        return None, 0
+    
+    # Stable ordering by primary key so an offset always maps to the same row
+    index = rng.randrange(total)
+    row = db.scalars(
+        select(model).where(*criteria).order_by(model.id).offset(index).limit(1)
+    ).first()
+    return row, total
+
+
+def sample_rows(db: Session, model, *criteria, k: int, rng: random.Random = random) -> Tuple[List[object], int]:
+    """
+    Pick `k` distinct rows uniformly at random among those matching the filters
+    Offsets are drawn up front and resolved in one streamed pass over the primary keys
+    Rows deleted after the count leave their offsets unresolved, so fewer rows come back
+    Returns (rows in draw order, eligible_count)
+    """
+    if k == 1:
+        row, total = pick_random_row(db, model, *criteria, rng=rng)
+        return ([row] if row else []), total
+    
+    total = count_rows(db, model, *criteria)
+    if not total:
+        return [], 0
+    
+    # rng.sample keeps the draw order: first offset is the first prize
+    offsets = rng.sample(range(total), min(k, total))
+    wanted = {offset: position for position, offset in enumerate(offsets)}
+    last_offset = max(offsets)
+    
+    picked_ids = [None] * len(offsets)
+    ids = db.execute(
+        select(model.id).where(*criteria).order_by(model.id).execution_options(yield_per=STREAM_BATCH_SIZE)
+    ).scalars()
+    for offset, row_id in enumerate(ids):
+        if offset in wanted:
+            picked_ids[wanted[offset]] = row_id
+        if offset == last_offset:
+            break
+    ids.close()
+    
+    rows = {row.id: row for row in db.scalars(select(model).where(model.id.in_(picked_ids)))}
+    return [rows[row_id] for row_id in picked_ids if row_id in rows], total
+
+
+def weighted_sample_groups(db: Session, group_column, *criteria, k: int, weighted: bool = True, rng: random.Random = random) -> Tuple[List[object], int]:
+    """
+    Pick `k` distinct values of `group_column` in one streamed pass over a GROUP BY
+    Each value is weighted by its row count (or equally when weighted is False),
+    using Efraimidis-Spirakis reservoir sampling: keep the k largest log(u) / weight keys
+    Returns (values in draw order, number of distinct values)
+    """
+    rows = db.execute(
+        select(group_column, func.count())
+        .where(*criteria)
+        .group_by(group_column)
+        .order_by(group_column)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    
+    heap = []
+    groups = 0
+    for value, count in rows:
+        groups += 1
+        weight = count if weighted else 1
+        # 1 - random() lies in (0, 1], so the logarithm is always defined
+        key = math.log(1.0 - rng.random()) / weight
+        if len(heap) < k:
+            heapq.heappush(heap, (key, value))
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, (key, value))
+    
+    return [value for _, value in sorted(heap, reverse=True)], groups
+
+
+def draw_ticket_winners(db: Session, raffle_id: int, winners: int, weighted: bool, rng: random.Random = random) -> Tuple[List[Ticket], int]:
+    """
+    Draw `winners` distinct participants of a ticket raffle, each winning with one of their tickets
+    Returns (winning tickets in draw order, eligible participants or tickets)
+    """
+    if winners == 1 and weighted:
+        # A uniformly random ticket is already weighted by tickets per participant
+        winner_ticket, eligible = pick_random_row(db, Ticket, Ticket.raffle_id == raffle_id, rng=rng)
+        return ([winner_ticket] if winner_ticket else []), eligible
+    
+    participant_ids, eligible = weighted_sample_groups(
+        db, 
+        Ticket.participant_id, 
+        Ticket.raffle_id == raffle_id, 
+        k=winners, 
+        weighted=weighted, 
+        rng=rng
+    )
+    winner_tickets = [
+        pick_random_row(
+            db, 
+            Ticket, 
+            Ticket.raffle_id == raffle_id, 
+            Ticket.participant_id == participant_id, 
+            rng=rng
+        )[0]
+        for participant_id in participant_ids
+    ]
+    # A participant whose tickets were deleted mid-draw has no ticket to win with
+    return [ticket for ticket in winner_tickets if ticket is not None], eligible
+
+
+def draw_instagram_winners(db: Session, raffle_id: int, winners: int, rng: random.Random = random) -> Tuple[List[InstagramParticipant], int, bool]:
+    """
+    Draw `winners` distinct participants of an Instagram raffle
+    Validated participants are preferred; when none are valid every participant is eligible
+    Returns (winners in draw order, eligible count, drew_from_valid_only)
+    """
+    drawn, total = sample_rows(
+        db, 
+        InstagramParticipant, 
+        InstagramParticipant.raffle_id == raffle_id,
+        InstagramParticipant.is_valid == True,
+        k=winners, 
+        rng=rng
+    )
+    if drawn:
+        return drawn, total, True
+    
+    drawn, total = sample_rows(
+        db, 
+        InstagramParticipant, 
+        InstagramParticipant.raffle_id == raffle_id,
+        k=winners, 
+        rng=rng
+    )
+    return drawn, total, False
@@ -1,49 +1,70 @@
 """
 File-based scraper for Instagram raffles
-Reads participants from base.txt instead of scraping Instagram
+Reads participants from base.txt (or any username list) instead of scraping Instagram
+Lines are read lazily, so huge lists go to the database chunk by chunk
 """
 
 from pathlib import Path
-from typing import List, Dict
+from typing import IO, Dict, Iterator, NamedTuple, Optional, Union
 from datetime import datetime
 
+BACKEND_DIR = Path(__file__).parent
+
+Source = Union[str, Path, IO]
+
+
+class FileParticipant(NamedTuple):
+    username: str
+    line: int
+
 
 class FileBasedScraper:
-    def __init__(self, base_file_path: str = "../base.txt"):
-        self.base_file_path = Path(__file__).parent.parent / "base.txt"
-    
-    def read_participants_from_file(self) -> Dict:
-        """Read participants from base.txt file"""
-        participants = []
-        
-        if not self.base_file_path.exists():
-            raise FileNotFoundError(f"File not found: {self.base_file_path}")
-        
-        print(f"📂 Reading participants from: {self.base_file_path}")
-        
-        with open(self.base_file_path, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                username = line.strip()
-                
-                # Skip empty lines
-                if not username:
-                    continue
-                
-                # Remove @ if present
-                if username.startswith('@'):
-                    username = username[1:]
-                
-                if username:
-                    participants.append({
-                        'username': username,
-                        'text': f'Participante importado de base.txt (linha {line_num})',
-                        'created_at': datetime.now(),
-                        'likes': 0,
-                        'tagged_users': []  # No tagged users from file
-                    })
-        
+    def __init__(self, base_file_path: Union[str, Path] = "../base.txt"):
+        # Relative paths are resolved from the backend directory
+        path = Path(base_file_path)
+        self.base_file_path = path if path.is_absolute() else (BACKEND_DIR / path).resolve()
+
+    def _lines(self, source: Optional[Source]) -> Iterator[str]:
+        """Text lines of a path, a text/binary stream (e.g. an upload) or the base file"""
+        if source is None or isinstance(source, (str, Path)):
+            path = self.base_file_path if source is None else Path(source)
+            if not path.exists():
+                raise FileNotFoundError(f"File not found: {path}")
+            print(f"📂 Reading participants from: {path}")
+            with open(path, 'r', encoding='utf-8-sig') as f:
+                yield from f
+            return
+
+        for line_num, line in enumerate(source):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', errors='replace')
+            yield line.lstrip('\ufeff') if line_num == 0 else line
+
+    def iter_participants(self, source: Optional[Source] = None) -> Iterator[FileParticipant]:
+        """Yield one (username, line) record per non-empty line, without building a list"""
+        for line_num, line in enumerate(self._lines(source), 1):
+            # Remove @ if present
+            username = line.strip().lstrip('@')
+            if username:
+                yield FileParticipant(username, line_num)
+
+    def iter_comments(self, source: Optional[Source] = None, label: str = 'base.txt') -> Iterator[Dict]:
+        """Participants as comment dicts for insert_instagram_participants, built one at a time"""
+        imported_at = datetime.now()
+        for participant in self.iter_participants(source):
+            yield {
+                'username': participant.username,
+                'text': f'Participante importado de {label} (linha {participant.line})',
+                'created_at': imported_at,
+                'likes': 0,
+                'tagged_users': []  # No tagged users from file
+            }
+
+    def read_participants_from_file(self, source: Optional[Source] = None) -> Dict:
+        """Read all participants into a post_data dict (small files; large ones should use iter_comments)"""
+        participants = list(self.iter_comments(source))
         print(f"✅ Imported {len(participants)} participants from file")
-        
+
         return {
             'shortcode': 'file_import',
             'owner_username': '',
@@ -0,0 +1,448 @@
+"""
+Caches for Instagram lookups shared by the validation workers
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, FrozenSet, Iterable, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from bulk_import import BATCH_SIZE, IN_CLAUSE_SIZE, chunked, normalize_username
+from database import SessionLocal
+from models import FollowerSnapshot, SnapshotFollower, ProfileCacheEntry, FollowEdge
+from rate_limiter import RateLimitExceeded
+
+FOLLOWER_CACHE_TTL = timedelta(hours=float(os.getenv("FOLLOWER_CACHE_TTL_HOURS", "24")))
+FOLLOWER_CACHE_SIZE = int(os.getenv("FOLLOWER_CACHE_SIZE", "20"))  # Follower sets kept in memory
+FAILED_FETCH_RETRY = timedelta(minutes=5)
+PROFILE_CACHE_TTL = timedelta(hours=float(os.getenv("PROFILE_CACHE_TTL_HOURS", "24")))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_PRUNE_EVERY = 1000  # Writes between deletions of expired rows
+FOLLOW_EDGE_TTL = timedelta(hours=float(os.getenv("FOLLOW_EDGE_TTL_HOURS", "24")))
+FOLLOW_EDGE_CACHE_SIZE = int(os.getenv("FOLLOW_EDGE_CACHE_SIZE", "100000"))
+WANTED_FOLLOWERS_SIZE = 10000  # Followers with planned edges; older plans are dropped, not lost edges
+LOCK_STRIPES = 64  # Per-key locks are striped, so their number stays fixed
+
+
+def striped_locks() -> list:
+    return [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+def stripe(locks: list, key: str) -> threading.Lock:
+    """Lock for `key`; unrelated keys sharing a stripe only wait for each other"""
+    return locks[hash(key) % len(locks)]
+
+
+class FollowerCache:
+    """
+    Follower sets of required accounts
+    Each set is streamed from Instagram once into follower_snapshots and kept
+    in memory as a frozenset (an LRU of at most max_size accounts, expired sets
+    dropped on lookup), so a required-follow check is a membership lookup
+    """
+
+    def __init__(self, ttl: timedelta = FOLLOWER_CACHE_TTL, max_size: int = FOLLOWER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sets: "OrderedDict[str, Tuple[datetime, FrozenSet[str]]]" = OrderedDict()
+        self.failures: Dict[str, Tuple[datetime, str]] = {}
+        self.locks = striped_locks()
+        self.lock = threading.Lock()
+
+    def _account_lock(self, account: str) -> threading.Lock:
+        return stripe(self.locks, account)
+
+    def _fresh(self, fetched_at: datetime) -> bool:
+        return datetime.utcnow() - fetched_at < self.ttl
+
+    def _cached(self, account: str) -> Optional[FrozenSet[str]]:
+        with self.lock:
+            cached = self.sets.get(account)
+            if cached is None:
+                return None
+            if not self._fresh(cached[0]):
+                del self.sets[account]
+                return None
+            self.sets.move_to_end(account)
+            return cached[1]
+
+    def _remember(self, account: str, fetched_at: datetime, followers: FrozenSet[str]):
+        with self.lock:
+            self.failures.pop(account, None)
+            self.sets[account] = (fetched_at, followers)
+            self.sets.move_to_end(account)
+            while len(self.sets) > self.max_size:
+                self.sets.popitem(last=False)
+
+    def _failed(self, account: str) -> Optional[str]:
+        """Message of a recent failed fetch; older failures are pruned"""
+        with self.lock:
+            now = datetime.utcnow()
+            for name in [name for name, (failed_at, _) in self.failures.items() if now - failed_at >= FAILED_FETCH_RETRY]:
+                del self.failures[name]
+            failed = self.failures.get(account)
+            return failed[1] if failed else None
+
+    def get(self, account: str, fetch: Callable[[], Iterable[str]]) -> FrozenSet[str]:
+        """
+        Follower usernames of `account`, fetched with `fetch` when the cached
+        snapshot is missing or older than the TTL
+        Concurrent callers for the same account wait for a single fetch
+        """
+        account = normalize_username(account)
+        with self._account_lock(account):
+            cached = self._cached(account)
+            if cached is not None:
+                return cached
+
+            failed = self._failed(account)
+            if failed:
+                raise LookupError(failed)
+
+            with SessionLocal() as db:
+                snapshot = db.scalar(select(FollowerSnapshot).where(FollowerSnapshot.account == account))
+                if snapshot and snapshot.complete and self._fresh(snapshot.fetched_at):
+                    fetched_at = snapshot.fetched_at
+                    followers = frozenset(db.scalars(
+                        select(SnapshotFollower.username)
+                        .where(SnapshotFollower.snapshot_id == snapshot.id)
+                        .execution_options(yield_per=BATCH_SIZE)
+                    ))
+                else:
+                    try:
+                        fetched_at, followers = self._refresh(db, snapshot, account, fetch)
+                    except RateLimitExceeded:
+                        raise
+                    except Exception as e:
+                        message = f"Could not fetch followers of @{account}: {e}"
+                        with self.lock:
+                            self.failures[account] = (datetime.utcnow(), message)
+                        raise LookupError(message) from e
+
+            self._remember(account, fetched_at, followers)
+            return followers
+
+    def _refresh(
+        self,
+        db: Session,
+        snapshot: FollowerSnapshot,
+        account: str,
+        fetch: Callable[[], Iterable[str]]
+    ) -> Tuple[datetime, FrozenSet[str]]:
+        """Stream a fresh follower list into the snapshot tables"""
+        print(f"👥 Fetching followers of @{account}...")
+        if snapshot is None:
+            snapshot = FollowerSnapshot(account=account)
+            db.add(snapshot)
+
+        fetched_at = datetime.utcnow()
+        snapshot.complete = False
+        snapshot.follower_count = 0
+        snapshot.fetched_at = fetched_at
+        db.flush()
+        snapshot_id = snapshot.id
+        db.execute(delete(SnapshotFollower).where(SnapshotFollower.snapshot_id == snapshot_id))
+        db.commit()
+
+        followers = set()
+        for batch in chunked(fetch(), BATCH_SIZE):
+            new_followers = {normalize_username(username) for username in batch} - followers
+            if new_followers:
+                db.execute(
+                    insert(SnapshotFollower),
+                    [{"snapshot_id": snapshot_id, "username": username} for username in new_followers]
+                )
+            followers |= new_followers
+            snapshot.follower_count = len(followers)
+            db.commit()
+
+        snapshot.complete = True
+        db.commit()
+        print(f"✅ @{account}: {len(followers)} followers cached")
+        return fetched_at, frozenset(followers)
+
+
+class ProfileInfo(NamedTuple):
+    username: str
+    user_id: int
+    is_private: bool
+    fetched_at: datetime
+
+
+class ProfileCache:
+    """
+    Profile metadata keyed by username: a size-bounded in-memory LRU in front
+    of the profile_cache table, both expiring after the TTL
+    The LRU also keeps the live Instaloader profile so follow lookups in the
+    same process don't fetch it again
+    """
+
+    def __init__(self, ttl: timedelta = PROFILE_CACHE_TTL, max_size: int = PROFILE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, Tuple[ProfileInfo, Optional[Any]]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _fresh(self, fetched_at: datetime) -> bool:
+        return datetime.utcnow() - fetched_at < self.ttl
+
+    def _remember(self, info: ProfileInfo, profile: Optional[Any]):
+        with self.lock:
+            self.entries[info.username] = (info, profile)
+            self.entries.move_to_end(info.username)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def _cached(self, username: str, need_profile: bool) -> Optional[Tuple[ProfileInfo, Optional[Any]]]:
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is None:
+                return None
+            if not self._fresh(entry[0].fetched_at):
+                del self.entries[username]
+                return None
+            if need_profile and entry[1] is None:
+                return None
+            self.entries.move_to_end(username)
+            self.hits += 1
+            return entry
+
+    def _load(self, username: str) -> Optional[ProfileInfo]:
+        with SessionLocal() as db:
+            row = db.get(ProfileCacheEntry, username)
+            if row is None or not self._fresh(row.fetched_at):
+                return None
+            return ProfileInfo(row.username, row.user_id, row.is_private, row.fetched_at)
+
+    def _store(self, info: ProfileInfo):
+        with SessionLocal() as db:
+            db.merge(ProfileCacheEntry(
+                username=info.username,
+                user_id=info.user_id,
+                is_private=info.is_private,
+                fetched_at=info.fetched_at
+            ))
+            self.writes += 1
+            if self.writes % PROFILE_PRUNE_EVERY == 0:
+                db.execute(delete(ProfileCacheEntry).where(
+                    ProfileCacheEntry.fetched_at < datetime.utcnow() - self.ttl
+                ))
+            db.commit()
+
+    def _fetch(self, username: str, fetch: Callable[[], Any]) -> Tuple[ProfileInfo, Any]:
+        with self.lock:
+            self.misses += 1
+        profile = fetch()
+        info = ProfileInfo(username, profile.userid, profile.is_private, datetime.utcnow())
+        self._store(info)
+        self._remember(info, profile)
+        return info, profile
+
+    def get(self, username: str, fetch: Callable[[], Any]) -> ProfileInfo:
+        """Cached metadata of `username`; `fetch` returns a live profile on a miss"""
+        username = normalize_username(username)
+        entry = self._cached(username, need_profile=False)
+        if entry:
+            return entry[0]
+
+        info = self._load(username)
+        if info:
+            with self.lock:
+                self.db_hits += 1
+            self._remember(info, None)
+            return info
+
+        return self._fetch(username, fetch)[0]
+
+    def get_profile(self, username: str, fetch: Callable[[], Any]) -> Any:
+        """Live profile of `username` (needed to list followees), fetched at most once per TTL in memory"""
+        username = normalize_username(username)
+        entry = self._cached(username, need_profile=True)
+        if entry:
+            return entry[1]
+        return self._fetch(username, fetch)[1]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.db_hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.db_hits) / lookups, 3) if lookups else 0.0
+        }
+
+
+class FollowGraph:
+    """
+    Cached follow edges (follower -> followee) for mutual-friend checks
+    Edges wanted across a raffle are grouped by follower, so each followee
+    list is scanned at most once and the scan stops as soon as every wanted
+    followee has been seen; results (including misses) go to follow_edges
+    The in-memory edges are an LRU of at most max_edges, expired ones dropped on lookup
+    """
+
+    def __init__(self, ttl: timedelta = FOLLOW_EDGE_TTL, max_edges: int = FOLLOW_EDGE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_edges = max_edges
+        self.edges: "OrderedDict[Tuple[str, str], Tuple[bool, datetime]]" = OrderedDict()
+        self.wanted: "OrderedDict[str, Set[str]]" = OrderedDict()
+        self.locks = striped_locks()
+        self.lock = threading.Lock()
+        self.scans = 0
+        self.edge_hits = 0
+
+    def _follower_lock(self, follower: str) -> threading.Lock:
+        return stripe(self.locks, follower)
+
+    def _fresh(self, checked_at: datetime) -> bool:
+        return datetime.utcnow() - checked_at < self.ttl
+
+    def _edge(self, follower: str, followee: str) -> Optional[bool]:
+        with self.lock:
+            cached = self.edges.get((follower, followee))
+            if cached is None:
+                return None
+            if not self._fresh(cached[1]):
+                del self.edges[(follower, followee)]
+                return None
+            self.edges.move_to_end((follower, followee))
+            return cached[0]
+
+    def _remember(self, follower: str, results: Dict[str, Tuple[bool, datetime]]):
+        with self.lock:
+            for followee, edge in results.items():
+                self.edges[(follower, followee)] = edge
+                self.edges.move_to_end((follower, followee))
+            while len(self.edges) > self.max_edges:
+                self.edges.popitem(last=False)
+
+    def _add_wanted(self, follower: str, followees: Set[str]):
+        """Caller holds self.lock"""
+        self.wanted.setdefault(follower, set()).update(followees)
+        while len(self.wanted) > WANTED_FOLLOWERS_SIZE:
+            # Dropping a plan only costs a separate scan later
+            self.wanted.popitem(last=False)
+
+    def want(self, follower: str, followee: str):
+        """Register an edge that will be needed, so it is found in the same scan as the others"""
+        follower, followee = normalize_username(follower), normalize_username(followee)
+        if follower != followee:
+            with self.lock:
+                self._add_wanted(follower, {followee})
+
+    def plan_mutual(self, participants: Iterable[Tuple[str, Iterable[str]]]):
+        """Register both edges of every (participant, tagged user) pair"""
+        for username, tagged_users in participants:
+            for tagged in tagged_users or []:
+                self.want(username, tagged)
+                self.want(tagged, username)
+
+    def _known(self, follower: str, followees: Set[str]) -> Dict[str, bool]:
+        """Fresh edges from memory, then from the follow_edges table"""
+        known = {}
+        for followee in followees:
+            cached = self._edge(follower, followee)
+            if cached is not None:
+                known[followee] = cached
+
+        missing = followees - known.keys()
+        if missing:
+            loaded = {}
+            with SessionLocal() as db:
+                for batch in chunked(missing, IN_CLAUSE_SIZE):
+                    rows = db.execute(
+                        select(FollowEdge.followee, FollowEdge.follows, FollowEdge.checked_at).where(
+                            FollowEdge.follower == follower,
+                            FollowEdge.followee.in_(batch)
+                        )
+                    )
+                    for followee, follows, checked_at in rows:
+                        if self._fresh(checked_at):
+                            known[followee] = follows
+                            loaded[followee] = (follows, checked_at)
+            self._remember(follower, loaded)
+        return known
+
+    def _store(self, follower: str, results: Dict[str, bool]):
+        checked_at = datetime.utcnow()
+        with SessionLocal() as db:
+            for batch in chunked(results, IN_CLAUSE_SIZE):
+                db.execute(delete(FollowEdge).where(
+                    FollowEdge.follower == follower,
+                    FollowEdge.followee.in_(batch)
+                ))
+                db.execute(insert(FollowEdge), [
+                    {"follower": follower, "followee": followee, "follows": results[followee], "checked_at": checked_at}
+                    for followee in batch
+                ])
+            db.commit()
+        self._remember(follower, {followee: (follows, checked_at) for followee, follows in results.items()})
+
+    def _put_back(self, follower: str, followees: Set[str]):
+        """Keep wanted edges this call did not scan for"""
+        if followees:
+            with self.lock:
+                self._add_wanted(follower, followees)
+
+    def follows(self, follower: str, followee: str, scan: Callable[[str], Iterable[str]]) -> bool:
+        """
+        Whether `follower` follows `followee`
+        `scan(follower)` yields the follower's followee usernames and is only
+        called when the edge is not cached
+        """
+        follower, followee = normalize_username(follower), normalize_username(followee)
+        with self._follower_lock(follower):
+            with self.lock:
+                targets = {followee} | self.wanted.pop(follower, set())
+
+            known = self._known(follower, targets)
+            if followee in known:
+                self.edge_hits += 1
+                self._put_back(follower, targets - known.keys())
+                return known[followee]
+
+            targets -= known.keys()
+            found = set()
+            self.scans += 1
+            try:
+                for username in scan(follower):
+                    username = normalize_username(username)
+                    if username in targets:
+                        found.add(username)
+                        if found == targets:
+                            break
+            except Exception:
+                self._put_back(follower, targets - {followee})
+                raise
+
+            # A finished scan answers every target; an early stop only happens when all were found
+            self._store(follower, {target: target in found for target in targets})
+            return followee in found
+
+    def stats(self) -> dict:
+        return {
+            "cached_edges": len(self.edges),
+            "max_edges": self.max_edges,
+            "pending_followers": len(self.wanted),
+            "followee_scans": self.scans,
+            "edge_hits": self.edge_hits
+        }
+
+
+# Singleton instances
+follower_cache = FollowerCache()
+profile_cache = ProfileCache()
+follow_graph = FollowGraph()
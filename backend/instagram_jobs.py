@@ -0,0 +1,139 @@
+"""
+Background job handlers for Instagram raffles
+"""
+
+import queue
+import threading
+from contextlib import closing
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from jobs import job_manager, JobContext
+from models import BackgroundJob, InstagramRaffle, InstagramParticipant
+from instagram_service import instagram_service
+from bulk_import import insert_instagram_participants
+from scrape_checkpoint import finish_scrape, load_checkpoint
+
+VALIDATION_PAGE_SIZE = 100
+SCRAPE_BATCH_SIZE = 200  # Participants per insert while comments stream in
+SCRAPE_POLL_INTERVAL = 1.0  # seconds between cancellation checks while waiting for comments
+
+
+@job_manager.handler("scrape")
+def scrape_raffle_comments(db: Session, job: BackgroundJob, ctx: JobContext):
+    """
+    Scrape the raffle's post with the browser scraper
+    Participants are inserted in batches while the page loads comments, each
+    batch committed with the job progress; the checkpoint is only advanced when
+    the scrape finishes, so a resumed job scrapes again and skips stored usernames
+    """
+    raffle = db.get(InstagramRaffle, job.raffle_id)
+    if not raffle:
+        raise ValueError(f"Instagram raffle {job.raffle_id} not found")
+    if raffle.status == "completed":
+        raise ValueError(f"Instagram raffle {job.raffle_id} already completed")
+    
+    batches: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    scrape = instagram_service.start_scrape(
+        raffle.post_url,
+        checkpoint=load_checkpoint(db, raffle.id),
+        on_participants=batches.put,
+        should_stop=stop.is_set
+    )
+    
+    try:
+        # The scraper only calls on_participants before it returns: once done, the queue is complete
+        while not (scrape.done() and batches.empty()):
+            try:
+                batch = batches.get(timeout=SCRAPE_POLL_INTERVAL)
+            except queue.Empty:
+                ctx.check_cancelled()
+                continue
+            
+            while len(batch) < SCRAPE_BATCH_SIZE and not batches.empty():
+                batch = batch + batches.get_nowait()
+            inserted = insert_instagram_participants(db, raffle, batch)
+            ctx.advance(len(batch), participants_found=inserted)
+            ctx.check_cancelled()
+        
+        post_data = scrape.result()
+    finally:
+        # Stop scrolling if the handler ends early (cancelled or failed)
+        stop.set()
+    
+    finish_scrape(db, raffle, post_data)
+    job.result = {
+        **job.result,
+        "shortcode": post_data['shortcode'],
+        "stop_reason": post_data['scroll']['stop_reason'],
+        "metrics": post_data['metrics']
+    }
+    ctx.set_total(job.processed, processed=job.processed)
+
+
+@job_manager.handler("validation")
+def validate_raffle_participants(db: Session, job: BackgroundJob, ctx: JobContext):
+    """
+    Validate every unvalidated participant of a raffle
+    Checks run concurrently on the service's rate-limited worker pool; each
+    result is committed with the job progress, so a resumed job only picks
+    up participants that are still unvalidated
+    """
+    raffle = db.get(InstagramRaffle, job.raffle_id)
+    if not raffle:
+        raise ValueError(f"Instagram raffle {job.raffle_id} not found")
+    if raffle.status == "completed":
+        raise ValueError(f"Instagram raffle {job.raffle_id} already completed")
+    
+    pending = select(InstagramParticipant).where(
+        InstagramParticipant.raffle_id == raffle.id,
+        InstagramParticipant.is_validated == False
+    )
+    remaining = db.scalar(select(func.count()).select_from(pending.subquery()))
+    ctx.set_total(job.processed + remaining, processed=job.processed)
+    
+    if raffle.require_mutual_friends:
+        # Group the follow edges of all pending participants so each user's followees are scanned once
+        instagram_service.plan_mutual_checks(db.execute(
+            select(InstagramParticipant.username, InstagramParticipant.tagged_users)
+            .where(
+                InstagramParticipant.raffle_id == raffle.id,
+                InstagramParticipant.is_validated == False
+            )
+            .execution_options(yield_per=1000)
+        ))
+    
+    last_id = 0
+    while True:
+        participants = db.scalars(
+            pending.where(InstagramParticipant.id > last_id)
+            .order_by(InstagramParticipant.id)
+            .limit(VALIDATION_PAGE_SIZE)
+        ).all()
+        if not participants:
+            break
+        
+        ctx.check_cancelled()
+        results = instagram_service.validate_many(
+            ((participant, participant.username, participant.tagged_users) for participant in participants),
+            required_follows=raffle.required_follows,
+            shortcode=raffle.shortcode,
+            require_public=raffle.require_public_profile,
+            require_mutual=raffle.require_mutual_friends
+        )
+        with closing(results):
+            for participant, is_valid, errors in results:
+                participant.is_validated = True
+                participant.is_valid = is_valid
+                participant.validation_errors = errors if errors else None
+                
+                if is_valid:
+                    ctx.advance(valid_participants=1)
+                else:
+                    ctx.advance(invalid_participants=1)
+                
+                ctx.check_cancelled()
+        
+        last_id = participants[-1].id
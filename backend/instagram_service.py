@@ -1,24 +1,75 @@
+import os
 import re
+import threading
 import instaloader
-from typing import List, Dict, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from instaloader.instaloadercontext import RateController
+from typing import Any, Callable, FrozenSet, Iterable, Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 
+from rate_limiter import AdaptiveRateLimiter, RateLimitExceeded, is_rate_limited
+from instagram_cache import follower_cache, profile_cache, follow_graph, normalize_username, ProfileInfo
+
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", "4"))
+INSTAGRAM_RATE_LIMIT = float(os.getenv("INSTAGRAM_RATE_LIMIT", "1.0"))  # requests per second
+INSTAGRAM_RATE_BURST = float(os.getenv("INSTAGRAM_RATE_BURST", "5"))
+INSTAGRAM_MAX_BACKOFF = float(os.getenv("INSTAGRAM_MAX_BACKOFF", "600"))
+RATE_LIMIT_RETRIES = 3
+FOLLOWEE_PAGE_SIZE = 50  # Results per Instagram followee page
+
+
+class SharedRateController(RateController):
+    """Instaloader rate controller that also slows down every other validation worker on 429"""
+
+    def __init__(self, context, limiter: AdaptiveRateLimiter):
+        super().__init__(context)
+        self.limiter = limiter
+
+    def handle_429(self, query_type: str) -> None:
+        self.limiter.throttle()
+        super().handle_429(query_type)
+
 
 class InstagramService:
     def __init__(self):
+        self.rate_limiter = AdaptiveRateLimiter(
+            rate=INSTAGRAM_RATE_LIMIT,
+            burst=INSTAGRAM_RATE_BURST,
+            max_pause=INSTAGRAM_MAX_BACKOFF
+        )
+        self.loader = self._new_loader()
+        # Per-thread Instaloader of the validation workers
+        self.local = threading.local()
+        self.logged_in = False
+        self.session_dir = Path(__file__).parent / "instagram_sessions"
+        self.session_dir.mkdir(exist_ok=True)
+    
+    def _new_loader(self) -> instaloader.Instaloader:
         # Configure Instaloader to look like a real browser (avoid bot detection)
-        self.loader = instaloader.Instaloader(
+        return instaloader.Instaloader(
             user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             request_timeout=30.0,
             max_connection_attempts=3,
             sleep=True,  # Add random delays between requests
             quiet=False,
-            compress_json=False
+            compress_json=False,
+            rate_controller=lambda context: SharedRateController(context, self.rate_limiter)
         )
-        self.logged_in = False
-        self.session_dir = Path(__file__).parent / "instagram_sessions"
-        self.session_dir.mkdir(exist_ok=True)
+    
+    def _init_worker(self):
+        """
+        Give a validation worker its own Instaloader, logged in with the main session:
+        an Instaloader context (requests.Session, rate controller) is not thread-safe
+        """
+        loader = self._new_loader()
+        if self.logged_in:
+            loader.load_session(self.loader.context.username, self.loader.save_session())
+        self.local.loader = loader
+    
+    def _context(self) -> instaloader.InstaloaderContext:
+        """Instaloader context of the calling thread: the worker's own one, else the main loader's"""
+        return getattr(self.local, "loader", self.loader).context
     
     def load_session(self, username: str) -> bool:
         """Load a saved session from file"""
@@ -60,6 +111,52 @@ class InstagramService:
                 return False
         return False
     
+    def _request(self, func: Callable[..., Any], *args) -> Any:
+        """Run an Instagram request through the shared rate limiter, retrying when throttled"""
+        for _ in range(RATE_LIMIT_RETRIES):
+            self.rate_limiter.acquire()
+            try:
+                result = func(*args)
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                self.rate_limiter.throttle()
+                continue
+            self.rate_limiter.success()
+            return result
+        raise RateLimitExceeded(f"Instagram is still rate limiting after {RATE_LIMIT_RETRIES} attempts")
+    
+    def _fetch_profile(self, username: str) -> instaloader.Profile:
+        return self._request(instaloader.Profile.from_username, self._context(), username)
+    
+    def _profile(self, username: str) -> instaloader.Profile:
+        """
+        Live profile object, reused from the profile cache when possible
+        The cached profile may come from another worker, so it is rebound to this thread's context
+        """
+        profile = profile_cache.get_profile(username, lambda: self._fetch_profile(username))
+        return instaloader.Profile(self._context(), profile._asdict())
+    
+    def profile_info(self, username: str) -> ProfileInfo:
+        """Cached profile metadata (user id, is_private) shared by all checks"""
+        return profile_cache.get(username, lambda: self._fetch_profile(username))
+    
+    def _followee_usernames(self, username: str) -> Iterator[str]:
+        """Stream followee usernames of a user, taking a rate-limit token per result page"""
+        profile = self._profile(username)
+        for index, followee in enumerate(profile.get_followees()):
+            if index and index % FOLLOWEE_PAGE_SIZE == 0:
+                self.rate_limiter.acquire()
+            yield followee.username
+    
+    def follows(self, username: str, target_username: str) -> bool:
+        """Follow edge from the cached graph, scanning the user's followees at most once"""
+        return follow_graph.follows(username, target_username, self._followee_usernames)
+    
+    def plan_mutual_checks(self, participants: Iterable[Tuple[str, List[str]]]):
+        """Register the (participant, tagged user) edges a raffle will need before validating it"""
+        follow_graph.plan_mutual(participants)
+    
     def extract_shortcode(self, post_url: str) -> str:
         """Extract shortcode from Instagram URL"""
         # https://www.instagram.com/p/DSAYQxiDfwR/ -> DSAYQxiDfwR
@@ -74,25 +171,48 @@ class InstagramService:
         mentions = re.findall(r'@([a-zA-Z0-9._]+)', text)
         return list(set(mentions))  # Remove duplicates
     
-    def scrape_post_comments(self, post_url: str) -> Dict:
-        """Scrape all comments from an Instagram post using Playwright (browser automation)"""
+    def start_scrape(self, post_url: str, **options) -> Future:
+        """
+        Start scraping a post's comments with Playwright (browser automation)
+        Runs on the scraper event loop; options go to PlaywrightInstagramScraper.scrape_post_comments
+        """
+        # Imported here: Playwright is only needed by the scrape path
+        from playwright_scraper import playwright_scraper
+        from scrape_runner import scrape_runner
+        return scrape_runner.submit(playwright_scraper.scrape_post_comments(post_url, **options))
+    
+    def scrape_post_comments(self, post_url: str, **options) -> Dict:
+        """Scrape all comments from an Instagram post, blocking until done"""
         try:
-            # Use Playwright scraper instead of Instaloader
-            from playwright_scraper import scrape_post_with_playwright
-            return scrape_post_with_playwright(post_url)
-            
+            return self.start_scrape(post_url, **options).result()
         except Exception as e:
             raise Exception(f"Failed to scrape post: {str(e)}")
     
+    def _followers(self, account: str) -> Iterator[str]:
+        """Stream follower usernames of an account (requires login)"""
+        profile = self._profile(account)
+        for follower in profile.get_followers():
+            yield follower.username
+    
+    def follower_set(self, account: str) -> FrozenSet[str]:
+        """Cached follower set of a required account, fetched once per TTL"""
+        return follower_cache.get(account, lambda: self._followers(account))
+    
     def check_user_follows(self, username: str, target_username: str) -> bool:
         """Check if a user follows a specific account"""
         try:
-            profile = instaloader.Profile.from_username(self.loader.context, username)
-            target_profile = instaloader.Profile.from_username(self.loader.context, target_username)
-            
+            return normalize_username(username) in self.follower_set(target_username)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            # Follower list unavailable (e.g. not logged in): check the user's followees instead
+            print(f"⚠️  {e}; checking followees of @{username}")
+        
+        try:
             # Check if target is in user's followees
-            followees = set(profile.get_followees())
-            return target_profile in followees
+            return self.follows(username, target_username)
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             print(f"Error checking follow status: {e}")
             return False
@@ -100,8 +220,9 @@ class InstagramService:
     def check_profile_public(self, username: str) -> bool:
         """Check if a user's profile is public"""
         try:
-            profile = instaloader.Profile.from_username(self.loader.context, username)
-            return not profile.is_private
+            return not self.profile_info(username).is_private
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             print(f"Error checking profile: {e}")
             return False
@@ -113,7 +234,7 @@ class InstagramService:
             return None
         
         try:
-            post = instaloader.Post.from_shortcode(self.loader.context, shortcode)
+            post = instaloader.Post.from_shortcode(self._context(), shortcode)
             # Note: Instagram API doesn't easily expose who liked a post
             # This is a limitation - we may need to skip this validation
             # or require manual verification
@@ -125,14 +246,10 @@ class InstagramService:
     def are_mutual_followers(self, username1: str, username2: str) -> bool:
         """Check if two users follow each other"""
         try:
-            profile1 = instaloader.Profile.from_username(self.loader.context, username1)
-            profile2 = instaloader.Profile.from_username(self.loader.context, username2)
-            
-            # Check if they follow each other
-            followees1 = set(profile1.get_followees())
-            followees2 = set(profile2.get_followees())
-            
-            return profile2 in followees1 and profile1 in followees2
+            # Second edge is only looked up when the first one exists
+            return self.follows(username1, username2) and self.follows(username2, username1)
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             print(f"Error checking mutual followers: {e}")
             return False
@@ -177,6 +294,34 @@ class InstagramService:
         
         is_valid = len(errors) == 0
         return is_valid, errors
+    
+    def validate_many(
+        self,
+        participants: Iterable[Tuple[Any, str, List[str]]],
+        workers: Optional[int] = None,
+        **rules
+    ) -> Iterator[Tuple[Any, bool, List[str]]]:
+        """
+        Validate (key, username, tagged_users) entries on a pool of workers
+        sharing the rate limiter; yields (key, is_valid, errors) as checks finish
+        Each worker makes its requests through its own Instaloader context
+        """
+        pool = ThreadPoolExecutor(
+            max_workers=workers or VALIDATION_WORKERS,
+            thread_name_prefix="validate",
+            initializer=self._init_worker
+        )
+        try:
+            futures = {
+                pool.submit(self.validate_participant, username=username, tagged_users=tagged_users, **rules): key
+                for key, username, tagged_users in participants
+            }
+            for future in as_completed(futures):
+                is_valid, errors = future.result()
+                yield futures[future], is_valid, errors
+        finally:
+            # Drop queued checks when the caller stops early (cancel / error)
+            pool.shutdown(wait=True, cancel_futures=True)
 
 
 # Singleton instance
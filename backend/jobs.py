@@ -0,0 +1,164 @@
+"""
+Persistent background jobs
+Jobs are rows in the background_jobs table executed by a small worker pool,
+so progress survives the HTTP request and unfinished jobs restart with the server
+"""
+
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import BackgroundJob
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when the job was cancelled"""
+
+
+class JobContext:
+    """Progress reporting and cancellation checks for a running job"""
+
+    def __init__(self, db: Session, job: BackgroundJob):
+        self.db = db
+        self.job = job
+        self.job.result = dict(self.job.result or {})
+
+    def set_total(self, total: int, processed: int = 0):
+        """Set the amount of work, `processed` counts work done in a previous run"""
+        self.job.total = total
+        self.job.processed = processed
+        self.db.commit()
+
+    def advance(self, count: int = 1, commit: bool = True, **counters: int):
+        """Record finished work and bump named result counters"""
+        self.job.processed += count
+        result = dict(self.job.result)
+        for name, value in counters.items():
+            result[name] = result.get(name, 0) + value
+        self.job.result = result
+        if commit:
+            self.db.commit()
+
+    def check_cancelled(self):
+        """Stop the handler if cancellation was requested from the API"""
+        cancel_requested = self.db.scalar(
+            select(BackgroundJob.cancel_requested).where(BackgroundJob.id == self.job.id)
+        )
+        if cancel_requested:
+            raise JobCancelled()
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.handlers: Dict[str, Callable[[Session, BackgroundJob, JobContext], None]] = {}
+
+    def handler(self, kind: str):
+        """Decorator registering the function that runs jobs of `kind`"""
+        def register(func):
+            self.handlers[kind] = func
+            return func
+        return register
+
+    def submit(self, job_id: int):
+        """Queue a pending job for execution"""
+        self.executor.submit(self._run, job_id)
+
+    def resume_unfinished(self):
+        """Re-queue jobs interrupted by a restart (handlers skip work already done)"""
+        with SessionLocal() as db:
+            jobs = db.scalars(
+                select(BackgroundJob).where(BackgroundJob.status.in_(("pending", "running")))
+            ).all()
+            for job in jobs:
+                job.status = "pending"
+            db.commit()
+            job_ids = [job.id for job in jobs]
+        
+        for job_id in job_ids:
+            print(f"🔁 Resuming job {job_id}")
+            self.submit(job_id)
+
+    def shutdown(self):
+        """Stop accepting jobs; running ones are resumed on next startup"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job_id: int):
+        with SessionLocal() as db:
+            job = db.get(BackgroundJob, job_id)
+            if not job or job.status != "pending":
+                return
+            
+            if job.cancel_requested:
+                job.status = "cancelled"
+                job.finished_at = datetime.utcnow()
+                db.commit()
+                return
+            
+            job.status = "running"
+            job.started_at = job.started_at or datetime.utcnow()
+            db.commit()
+            print(f"⚙️  Job {job.id} ({job.kind}) started")
+            
+            try:
+                self.handlers[job.kind](db, job, JobContext(db, job))
+                job.status = "completed"
+            except JobCancelled:
+                db.rollback()
+                job.status = "cancelled"
+            except Exception as e:
+                db.rollback()
+                traceback.print_exc()
+                job.status = "failed"
+                job.error = str(e)
+            
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            print(f"⚙️  Job {job.id} ({job.kind}) {job.status}: {job.processed}/{job.total}")
+
+
+def active_job(db: Session, kind: str, raffle_id: int):
+    """Unfinished job of `kind` for a raffle, if any"""
+    return db.scalar(
+        select(BackgroundJob)
+        .where(
+            BackgroundJob.kind == kind,
+            BackgroundJob.raffle_id == raffle_id,
+            BackgroundJob.status.not_in(FINISHED_STATUSES)
+        )
+        .order_by(BackgroundJob.id.desc())
+    )
+
+
+def has_active_job(db: Session, raffle_id: int) -> bool:
+    """Whether any job of a raffle is still pending or running"""
+    return db.scalar(select(exists().where(
+        BackgroundJob.raffle_id == raffle_id,
+        BackgroundJob.status.not_in(FINISHED_STATUSES)
+    )))
+
+
+def enqueue_job(db: Session, kind: str, raffle_id: int) -> BackgroundJob:
+    """Return the raffle's running job of `kind` or create and queue a new one"""
+    job = active_job(db, kind, raffle_id)
+    if job:
+        return job
+    
+    job = BackgroundJob(kind=kind, raffle_id=raffle_id, status="pending", result={})
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    job_manager.submit(job.id)
+    return job
+
+
+# Singleton instance
+job_manager = JobManager(max_workers=int(os.getenv("JOB_WORKERS", "2")))
@@ -0,0 +1,97 @@
+"""
+Lean page mode for scraping
+Blocks images, media, fonts and third-party requests, waits on comment
+events instead of fixed sleeps, and measures what a scrape cost
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+SCRAPE_LEAN = os.getenv("SCRAPE_LEAN", "true").lower() == "true"
+FIRST_COMMENT_TIMEOUT = float(os.getenv("SCRAPE_FIRST_COMMENT_TIMEOUT", "20"))  # seconds
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+FIRST_PARTY_DOMAINS = ("instagram.com", "cdninstagram.com", "fbcdn.net")
+
+# Rendered comments: permalinks to /c/<id>/ or the nested comment list
+COMMENT_READY_SELECTOR = 'a[href*="/c/"], ul ul li'
+
+
+def is_first_party(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return any(host == domain or host.endswith("." + domain) for domain in FIRST_PARTY_DOMAINS)
+
+
+class PageMetrics:
+    """Time to first comment, bytes transferred and request counts of one scrape"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_comment: Optional[float] = None
+        self.bytes_transferred = 0
+        self.requests = 0
+        self.blocked_requests = 0
+        self.pending = set()
+
+    def attach(self, page):
+        page.on("requestfinished", self._on_request_finished)
+
+    def _on_request_finished(self, request):
+        self.requests += 1
+        task = asyncio.ensure_future(self._measure(request))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def _measure(self, request):
+        try:
+            sizes = await request.sizes()
+            self.bytes_transferred += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass  # Page closed before the sizes were read
+
+    def mark_first_comment(self):
+        if self.first_comment is None:
+            self.first_comment = time.monotonic()
+
+    async def drain(self):
+        if self.pending:
+            await asyncio.gather(*list(self.pending), return_exceptions=True)
+
+    def report(self) -> dict:
+        now = time.monotonic()
+        return {
+            "time_to_first_comment_ms": round((self.first_comment - self.started) * 1000) if self.first_comment else None,
+            "duration_ms": round((now - self.started) * 1000),
+            "bytes_transferred": self.bytes_transferred,
+            "requests": self.requests,
+            "blocked_requests": self.blocked_requests
+        }
+
+
+async def enable_lean_mode(page, metrics: PageMetrics):
+    """Abort images, media, fonts and anything not served by Instagram"""
+    async def handle(route):
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or not is_first_party(request.url):
+            metrics.blocked_requests += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await page.route("**/*", handle)
+
+
+async def wait_for_first_comment(page, capture=None, timeout: float = FIRST_COMMENT_TIMEOUT) -> bool:
+    """Wait until a comment is rendered or captured from the network, whichever comes first"""
+    waiters = [asyncio.ensure_future(page.wait_for_selector(COMMENT_READY_SELECTOR, timeout=timeout * 1000))]
+    if capture is not None:
+        waiters.append(asyncio.ensure_future(capture.first_comment.wait()))
+
+    done, pending = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    for waiter in pending:
+        waiter.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return any(not waiter.cancelled() and waiter.exception() is None for waiter in done)
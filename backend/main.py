@@ -1,8 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from database import init_db
-from routers import participants, raffles, instagram
+from routers import participants, raffles, instagram, jobs
+from jobs import job_manager
+from scrape_runner import scrape_runner
 from instagram_service import instagram_service
+from draw_audit import RaffleCompleted
 import os
 from dotenv import load_dotenv
 
@@ -25,10 +29,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(RaffleCompleted)
+async def raffle_completed_handler(request: Request, exc: RaffleCompleted):
+    """Writes racing a draw are rejected like the endpoints' own status checks"""
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
 # Include routers
 app.include_router(participants.router)
 app.include_router(raffles.router)
 app.include_router(instagram.router)
+app.include_router(jobs.router)
 
 
 @app.on_event("startup")
@@ -36,6 +47,9 @@ async def startup_event():
     """Initialize database and Instagram login on startup"""
     init_db()
     
+    # Restart background jobs interrupted by the last shutdown
+    job_manager.resume_unfinished()
+    
     # Auto-login to Instagram if credentials are provided
     instagram_username = os.getenv("INSTAGRAM_USERNAME")
     instagram_password = os.getenv("INSTAGRAM_PASSWORD")
@@ -55,6 +69,13 @@ async def startup_event():
         print("   Set INSTAGRAM_USERNAME and INSTAGRAM_PASSWORD in .env file to enable auto-login")
 
 
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stop the background job workers and close the warm browsers"""
+    job_manager.shutdown()
+    scrape_runner.shutdown()
+
+
 @app.get("/")
 def root():
     """Root endpoint"""
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -27,17 +27,33 @@ class Raffle(Base):
     status = Column(String, default="pending")  # pending, active, completed
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Verifiable draw (see draw_audit.py)
+    seed_commitment = Column(String, nullable=True)  # sha256 of draw_secret, public before the draw
+    draw_secret = Column(String, nullable=True)  # Revealed only after the draw
+    entries_digest = Column(String, nullable=True)  # Order-independent digest of all tickets
+    entries_count = Column(Integer, nullable=True)
+    draw_seed = Column(String, nullable=True)
+
+    # Copies made with /duplicate point at the first raffle of their lineage (not a foreign key: the original may be deleted)
+    clone_root_id = Column(Integer, nullable=True, index=True)
+
     # Relationships
     tickets = relationship("Ticket", back_populates="raffle")
 
 
 class Ticket(Base):
     __tablename__ = "tickets"
+    __table_args__ = (
+        # Duplicate ticket numbers are rejected by the database (see database.insert_ignore)
+        Index("uq_tickets_raffle_ticket_number", "raffle_id", "ticket_number", unique=True),
+        Index("ix_tickets_raffle_participant", "raffle_id", "participant_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     ticket_number = Column(String, nullable=False, index=True)
     participant_id = Column(Integer, ForeignKey("participants.id"), nullable=False)
-    raffle_id = Column(Integer, ForeignKey("raffles.id"), nullable=False)
+    # Plain index keeps a raffle's rows in id order for count/offset draws
+    raffle_id = Column(Integer, ForeignKey("raffles.id"), nullable=False, index=True)
     is_winner = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -61,15 +77,31 @@ class InstagramRaffle(Base):
     draw_date = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Verifiable draw (see draw_audit.py)
+    seed_commitment = Column(String, nullable=True)  # sha256 of draw_secret, public before the draw
+    draw_secret = Column(String, nullable=True)  # Revealed only after the draw
+    entries_digest = Column(String, nullable=True)  # Order-independent digest of all usernames
+    entries_count = Column(Integer, nullable=True)
+    draw_seed = Column(String, nullable=True)
+
+    # Copies made with /duplicate point at the first raffle of their lineage (not a foreign key: the original may be deleted)
+    clone_root_id = Column(Integer, nullable=True, index=True)
+
     # Relationships
     participants = relationship("InstagramParticipant", back_populates="raffle")
 
 
 class InstagramParticipant(Base):
     __tablename__ = "instagram_participants"
+    __table_args__ = (
+        # One entry per username in each raffle, enforced by the database
+        Index("uq_instagram_participants_raffle_username", "raffle_id", "username", unique=True),
+        Index("ix_instagram_participants_raffle_valid", "raffle_id", "is_valid"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    raffle_id = Column(Integer, ForeignKey("instagram_raffles.id"), nullable=False)
+    # Plain index keeps a raffle's rows in id order for count/offset draws
+    raffle_id = Column(Integer, ForeignKey("instagram_raffles.id"), nullable=False, index=True)
     username = Column(String, nullable=False, index=True)
     comment_text = Column(String, nullable=False)
     tagged_users = Column(JSON, nullable=False)  # List of @mentions
@@ -88,3 +120,81 @@ class InstagramParticipant(Base):
 
     # Relationships
     raffle = relationship("InstagramRaffle", back_populates="participants")
+
+
+class DrawAuditLog(Base):
+    __tablename__ = "draw_audit_log"
+
+    id = Column(Integer, primary_key=True, index=True)
+    raffle_type = Column(String, nullable=False)  # ticket, instagram
+    raffle_id = Column(Integer, nullable=False, index=True)
+    seed = Column(String, nullable=False)
+    entries_digest = Column(String, nullable=False)
+    entries_count = Column(Integer, nullable=False)
+    params = Column(JSON, nullable=False)  # Arguments needed to replay the draw
+    winner_ids = Column(JSON, nullable=False)  # Ticket or participant ids, in draw order
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # validation
+    raffle_id = Column(Integer, nullable=True, index=True)
+    status = Column(String, default="pending")  # pending, running, completed, failed, cancelled
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    result = Column(JSON, nullable=True)  # Handler specific counters
+    error = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class FollowerSnapshot(Base):
+    __tablename__ = "follower_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    account = Column(String, unique=True, nullable=False, index=True)  # Required account (lowercase)
+    follower_count = Column(Integer, default=0)
+    complete = Column(Boolean, default=False)  # False while (or if) the fetch did not finish
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SnapshotFollower(Base):
+    __tablename__ = "snapshot_followers"
+
+    snapshot_id = Column(Integer, ForeignKey("follower_snapshots.id", ondelete="CASCADE"), primary_key=True)
+    username = Column(String, primary_key=True)
+
+
+class ProfileCacheEntry(Base):
+    __tablename__ = "profile_cache"
+
+    username = Column(String, primary_key=True)  # Lowercase
+    user_id = Column(BigInteger, nullable=False)
+    is_private = Column(Boolean, nullable=False)
+    fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class FollowEdge(Base):
+    __tablename__ = "follow_edges"
+
+    follower = Column(String, primary_key=True)  # Lowercase usernames
+    followee = Column(String, primary_key=True)
+    follows = Column(Boolean, nullable=False)
+    checked_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ScrapeCheckpoint(Base):
+    __tablename__ = "scrape_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    raffle_id = Column(Integer, ForeignKey("instagram_raffles.id"), unique=True, nullable=False, index=True)
+    shortcode = Column(String, nullable=False)
+    frontier_ids = Column(JSON, nullable=True)  # Newest comment ids seen, the next run stops when it reaches them
+    comments_seen = Column(Integer, default=0)
+    runs = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
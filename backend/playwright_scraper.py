@@ -3,14 +3,26 @@ Instagram scraper using Playwright (real browser automation)
 This bypasses Instagram's bot detection by using a real browser
 """
 
+import os
 import re
 import asyncio
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Set, Tuple
 from datetime import datetime
 from pathlib import Path
 from playwright.async_api import async_playwright, Browser, Page
 import time
 import shutil
+from itertools import islice
+
+from browser_pool import browser_pool, context_options
+from lean_page import SCRAPE_LEAN, PageMetrics, enable_lean_mode, wait_for_first_comment
+from scroll_controller import SCRAPE_TIME_BUDGET, ScrollController
+from comment_capture import (
+    EXTRACT_COMMENTS_JS, 
+    CommentCapture, 
+    ParticipantStream, 
+    comments_from_dom_rows
+)
 
 # iPhone 12 Pro device configuration (manual, since devices may not be available)
 IPHONE_12_PRO = {
@@ -18,6 +30,8 @@ IPHONE_12_PRO = {
     'userAgent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Mobile/15E148 Safari/604.1'
 }
 
+SCRAPE_MODE = os.getenv("SCRAPE_MODE", "capture")  # capture, dom
+STREAM_DOM_EVERY = 100  # dom mode: re-read the rendered comments every N new comments when streaming
 
 
 class PlaywrightInstagramScraper:
@@ -41,25 +55,10 @@ class PlaywrightInstagramScraper:
             
             playwright = await async_playwright().start()
             
-            # Build args list
-            browser_args = [
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--no-sandbox'
-            ]
-            
-            # Add DevTools auto-open when not headless
-            if not headless:
-                browser_args.append('--auto-open-devtools-for-tabs')
-            
             # Use persistent context to save cookies and login state
             self.context = await playwright.chromium.launch_persistent_context(
                 user_data_dir=str(self.user_data_dir),
-                headless=headless,
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                args=browser_args,
-                devtools=not headless  # Open DevTools automatically when not headless
+                **context_options(headless)
             )
             
             # Get the default page or create new one
@@ -155,55 +154,94 @@ class PlaywrightInstagramScraper:
             print(f"❌ Login failed: {e}")
             return False
     
-    async def scrape_post_comments(self, post_url: str, max_comments: int = 500) -> Dict:
-        """Scrape comments from Instagram post using browser automation"""
-        # Check if context exists and is still valid
-        if not hasattr(self, 'context') or self.context is None:
-            print("🔄 Initializing browser for the first time...")
-            await self.init_browser(headless=False)
+    async def extract_dom_comments(self, page: Page, frontier: Set[str] = frozenset()) -> Tuple[List[Dict], bool]:
+        """
+        Read every rendered comment container with a single page.evaluate
+        Mentions, ids and filtering are handled in Python; returns (comments, reached_checkpoint)
+        """
+        rows = await page.evaluate(EXTRACT_COMMENTS_JS)
+        print(f"  ✓ Encontrados {len(rows)} containers de comentários")
+        return comments_from_dom_rows(rows, frontier)
+    
+    async def scrape_post_comments(
+        self,
+        post_url: str,
+        max_comments: Optional[int] = None,
+        checkpoint: Optional[Dict] = None,
+        mode: str = SCRAPE_MODE,
+        lean: bool = SCRAPE_LEAN,
+        time_budget: float = SCRAPE_TIME_BUDGET,
+        on_participants: Optional[Callable[[List[Dict]], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Dict:
+        """
+        Scrape comments from Instagram post using browser automation
+        - mode "capture": parse the comment JSON of the page's GraphQL/API responses
+          while scrolling (no per-comment browser calls, no comment cap)
+        - mode "dom": read the rendered comment containers in one evaluate
+        In lean mode images, media, fonts and third-party requests are blocked;
+        post_data['metrics'] reports time to first comment and bytes transferred
+        Scrolling (see scroll_controller.py) stops at the real end of the list,
+        after max_comments comments, when time_budget seconds are spent or when
+        should_stop() returns True
+        on_participants receives each batch of new participants while comments
+        load, so callers can store them before the scrape ends
+        With a checkpoint from a previous run (see scrape_checkpoint.py) scrolling
+        and extraction stop at the first already seen comment, so only newer
+        comments are returned
+        """
+        # Warm context from the pool: no browser startup, other raffles can scrape at the same time
+        async with browser_pool.lease() as context:
+            return await self._scrape_in_context(
+                context, post_url, max_comments, checkpoint, mode, lean, time_budget,
+                on_participants=on_participants,
+                should_stop=should_stop
+            )
+    
+    async def _scrape_in_context(
+        self,
+        context,
+        post_url: str,
+        max_comments: Optional[int],
+        checkpoint: Optional[Dict],
+        mode: str,
+        lean: bool,
+        time_budget: float,
+        on_participants: Optional[Callable[[List[Dict]], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Dict:
+        frontier = set((checkpoint or {}).get('frontier_ids') or [])
+        capture = CommentCapture(frontier) if mode == "capture" else None
         
         # Create a new page for this scrape with MOBILE EMULATION
-        # Flow: blank page → DevTools → mobile mode → navigate to comments
-        page = None
-        try:
-            # Step 1: Open blank page first
-            page = await self.context.new_page()
-            print("📄 Página em branco aberta")
-            await page.goto('about:blank')
-            await page.wait_for_timeout(500)
-            
-            # Step 2: DevTools opens automatically (configured in init_browser)
-            print("🔧 DevTools aberto automaticamente")
-            
-            # Step 3: Configure mobile emulation (simulates Ctrl+Shift+M)
-            await page.set_viewport_size(IPHONE_12_PRO['viewport'])
-            await page.set_extra_http_headers({
-                'User-Agent': IPHONE_12_PRO['userAgent']
-            })
-            print("📱 Modo mobile ativado (iPhone 12 Pro)")
-            print("💡 Aguardando 3 segundos para estabilizar...")
-            await page.wait_for_timeout(3000)  # Delay de 3 segundos após modo mobile
-            
-        except Exception as e:
-            # If context is closed, reinitialize
-            print(f"⚠️  Context was closed, reinitializing browser...")
-            await self.init_browser(headless=False)
-            page = await self.context.new_page()
-            await page.goto('about:blank')
-            await page.wait_for_timeout(1000)
-            await page.set_viewport_size(IPHONE_12_PRO['viewport'])
-            await page.set_extra_http_headers({
-                'User-Agent': IPHONE_12_PRO['userAgent']
-            })
+        # Flow: blank page → mobile mode → navigate to comments
+        page = await context.new_page()
+        await page.goto('about:blank')
+        
+        # Configure mobile emulation (simulates Ctrl+Shift+M)
+        await page.set_viewport_size(IPHONE_12_PRO['viewport'])
+        await page.set_extra_http_headers({
+            'User-Agent': IPHONE_12_PRO['userAgent']
+        })
+        print("📱 Modo mobile ativado (iPhone 12 Pro)")
+        
+        metrics = PageMetrics()
+        metrics.attach(page)
+        if lean:
+            await enable_lean_mode(page, metrics)
+            print("🪶 Modo leve: imagens, mídia, fontes e rastreadores bloqueados")
         
         try:
             shortcode = self.extract_shortcode(post_url)
             
-            # Step 4: NOW navigate to COMMENTS page (after mobile is configured)
+            # Listen before navigating: the first comment page loads with the document
+            if capture:
+                capture.attach(page)
+            
+            # NOW navigate to COMMENTS page (after mobile is configured)
             comments_url = f"https://www.instagram.com/p/{shortcode}/comments/"
             print(f"🌐 Navegando para: {comments_url}")
-            await page.goto(comments_url, wait_until='networkidle', timeout=60000)
-            await page.wait_for_timeout(500)  # Reduzido para 500ms (ultra rápido)
+            await page.goto(comments_url, wait_until='domcontentloaded', timeout=60000)
             
             # Verify we're on the comments page
             current_url = page.url
@@ -215,11 +253,19 @@ class PlaywrightInstagramScraper:
                 print(f"   Atual: {current_url}")
                 # Try to navigate again
                 print("🔄 Tentando navegar novamente...")
-                await page.goto(comments_url, wait_until='networkidle', timeout=60000)
-                await page.wait_for_timeout(800)  # Reduzido para 800ms
+                await page.goto(comments_url, wait_until='domcontentloaded', timeout=60000)
                 current_url = page.url
                 print(f"📍 Nova URL: {current_url}")
             
+            # Wait for the first comment (rendered or captured) instead of fixed sleeps
+            print("🔍 Waiting for comments to load...")
+            if capture:
+                await capture.add_embedded(page)  # First page may already be in the HTML
+            if await wait_for_first_comment(page, capture):
+                metrics.mark_first_comment()
+                print(f"  ✅ Primeiro comentário em {metrics.report()['time_to_first_comment_ms']} ms")
+            else:
+                print("  ⚠️  No comments container found, will try to extract anyway...")
             
             # Get post metadata
             post_data = {
@@ -242,247 +288,94 @@ class PlaywrightInstagramScraper:
             except:
                 pass
             
-            # Wait for comments section to load (try multiple selectors)
-            print("🔍 Waiting for comments to load...")
-            
-            # Try different selectors that Instagram might use
-            comment_selectors = [
-                'ul ul li',  # Nested list items (common in Instagram)
-                'article ul li',  # Comments in article
-                '[role="button"]:has-text("comment")',  # Comment button
-                'span:has-text("@")',  # Any mention
-            ]
-            
-            comments_found = False
-            for selector in comment_selectors:
-                try:
-                    await page.wait_for_selector(selector, timeout=5000)
-                    print(f"  ✅ Found comments using selector: {selector}")
-                    comments_found = True
-                    break
-                except:
-                    continue
-            
-            if not comments_found:
-                print("  ⚠️  No comments container found, will try to extract anyway...")
-            
-            # Give it extra time for dynamic content
-            await page.wait_for_timeout(500)  # Reduzido para 500ms
-            
-            # Scroll to load comments - FIND THE SCROLLABLE CONTAINER
-            print("📜 Carregando TODOS os comentários (rolando container)...")
-            print("=" * 60)
-            previous_comment_count = 0
-            no_change_count = 0
-            max_attempts = 20  # Reduzido para 20 (muito mais rápido)
-            
-            # Try to find the scrollable comments container
-            print("🔍 Procurando container de comentários...")
-            scrollable_container = None
-            
-            # Try to find the main scrollable element
-            container_selectors = [
-                'div[style*="overflow"]',  # Any div with overflow
-                'article',  # Main article
-                'main',  # Main content
-            ]
-            
-            for scroll_attempt in range(max_attempts):
-                try:
-                    # Wrap entire iteration in timeout (2 seconds max per iteration)
-                    async def scroll_iteration():
-                        # Count current comments (use a more generic selector)
-                        current_elements = await page.query_selector_all('a[href^="/"][role="link"]')
-                        current_count = len(current_elements)
-                        
-                        # Visual progress bar
-                        progress = int((scroll_attempt / max_attempts) * 40)
-                        bar = "█" * progress + "░" * (40 - progress)
-                        print(f"\r  [{bar}] {scroll_attempt + 1}/{max_attempts} | 💬 {current_count} links encontrados", end="", flush=True)
-                        
-                        # Execute all scroll methods in one go (faster)
-                        try:
-                            # Combined scroll: page + containers + mouse wheel
-                            await page.evaluate('''
-                                () => {
-                                    // Scroll page
-                                    window.scrollTo(0, document.body.scrollHeight);
-                                    
-                                    // Scroll all containers
-                                    const scrollables = document.querySelectorAll('div[style*="overflow"], article, main');
-                                    scrollables.forEach(el => {
-                                        if (el.scrollHeight > el.clientHeight) {
-                                            el.scrollTop = el.scrollHeight;
-                                        }
-                                    });
-                                }
-                            ''')
-                            
-                            # Mouse wheel and keyboard in parallel
-                            await page.mouse.wheel(0, 10000)
-                            await page.keyboard.press('End')
-                            
-                            # Reduced wait time - ultra rápido
-                            await page.wait_for_timeout(150)  # Reduzido para 150ms
-                        except Exception as e:
-                            # If scroll fails, just continue
-                            pass
-                        
-                        return current_count
-                    
-                    # Execute with timeout (1 segundo por iteração)
-                    current_count = await asyncio.wait_for(scroll_iteration(), timeout=1.0)
-                    
-                except asyncio.TimeoutError:
-                    print(f"\n  ⚠️  Timeout na iteração {scroll_attempt + 1}, continuando...")
-                    current_count = previous_comment_count
-                except Exception as e:
-                    print(f"\n  ⚠️  Erro na iteração {scroll_attempt + 1}: {e}")
-                    current_count = previous_comment_count
-                
-                # Try to click "Load more comments" buttons
-                try:
-                    load_more_selectors = [
-                        'button:has-text("Load more comments")',
-                        'button:has-text("View more comments")',
-                        'button:has-text("Ver mais comentários")',
-                        'svg[aria-label*="Load"]',
-                        'div[role="button"]',
-                    ]
-                    
-                    for selector in load_more_selectors:
-                        try:
-                            load_more = await page.query_selector(selector)
-                            if load_more:
-                                await load_more.click()
-                                print(f"\n  ⏳ Clicou em botão de carregar mais")
-                                await page.wait_for_timeout(500)  # Reduzido para 500ms
-                                break
-                        except:
-                            continue
-                except:
-                    pass
-                
-                # Check if we got new comments
-                if current_count == previous_comment_count:
-                    no_change_count += 1
-                    print(f"\n  ⏸️  Sem mudanças ({no_change_count}/1)", end="", flush=True)
-                    if no_change_count >= 1:  # Para após 1 tentativa (muito mais rápido)
-                        print(f"\n  ✅ Finalizado! Total: {current_count} links encontrados")
-                        print("=" * 60)
-                        break
+            stream = ParticipantStream(post_data['owner_username'])
+            streamed = 0  # Comments already handed to the stream
+            
+            async def stream_loaded():
+                """Pass participants of the comments loaded so far to on_participants"""
+                nonlocal streamed
+                if capture:
+                    loaded = list(islice(capture.comments.values(), streamed, None))
+                    streamed += len(loaded)
+                elif scroller.comments - streamed >= STREAM_DOM_EVERY:
+                    loaded, _ = comments_from_dom_rows(await page.evaluate(EXTRACT_COMMENTS_JS), frontier)
+                    streamed = scroller.comments
                 else:
-                    no_change_count = 0
-                    previous_comment_count = current_count
-                
-                # Early exit if we have a good amount of comments and no change
-                if current_count > 50 and no_change_count >= 1:
-                    print(f"\n  ✅ Finalizado antecipadamente! Total: {current_count} links")
-                    print("=" * 60)
-                    break
+                    return
+                participants = stream.add(loaded)
+                if participants:
+                    on_participants(participants)
             
-            print(f"\n📊 Scroll completo! Total de {previous_comment_count} links encontrados")
+            # Scroll until the end of the list, the target count, the checkpoint or the time budget
+            print("📜 Carregando TODOS os comentários (rolagem adaptativa)...")
+            print("=" * 60)
+            scroller = ScrollController(
+                page,
+                capture=capture,
+                frontier=frontier,
+                target_comments=max_comments,
+                time_budget=time_budget,
+                on_round=stream_loaded if on_participants else None,
+                should_stop=should_stop
+            )
+            scroll_stats = await scroller.run()
+            reached_checkpoint = scroller.reached_checkpoint
+            if reached_checkpoint:
+                print(f"\n  📍 Checkpoint alcançado, comentários anteriores já foram coletados")
+            print(f"\n📊 Scroll completo ({scroll_stats['stop_reason']})! {scroll_stats['comments']} comentários em {scroll_stats['rounds']} rodadas")
+            print("=" * 60)
             
-            # Extract comments - CONTAINER-BASED APPROACH
+            # Extract comments
             print("💬 Extraindo comentários...")
-            
-            # Find comment containers instead of all links
-            # This prevents clicking on tagged user links within comments
-            try:
-                # Try multiple selectors for comment containers
-                comment_containers = []
-                container_selectors = [
-                    'ul ul li',  # Nested list items (common in Instagram)
-                    'article ul li',  # Comments in article
-                    'div[role="button"]',  # Comment containers with button role
-                ]
-                
-                for selector in container_selectors:
-                    try:
-                        containers = await page.query_selector_all(selector)
-                        if len(containers) > len(comment_containers):
-                            comment_containers = containers
-                            print(f"  ✓ Usando seletor: {selector}")
-                            break
-                    except:
-                        continue
-                
-                print(f"  ✓ Encontrados {len(comment_containers)} containers de comentários")
-            except Exception as e:
-                print(f"  ⚠️  Erro ao buscar containers: {e}")
-                comment_containers = []
-            
-            comments = []
-            seen_usernames = set()
-            processed = 0
-            max_to_process = min(len(comment_containers), 500)  # Limit processing to avoid hanging
-            
-            print(f"  🔄 Processando até {max_to_process} containers...")
-            
-            for container in comment_containers[:max_to_process]:  # Limit the loop
-                try:
-                    processed += 1
-                    if processed % 50 == 0:  # Progress every 50 items
-                        print(f"\r  📊 Processados: {processed}/{max_to_process} | Comentários válidos: {len(comments)}", end="", flush=True)
-                    
-                    # Get the FIRST link in this container (the comment author)
-                    # This avoids clicking on tagged user links
-                    author_link = await container.query_selector('a[href^="/"][role="link"]')
-                    if not author_link:
-                        continue
-                    
-                    href = await author_link.get_attribute('href')
-                    if not href or href == '/' or '/p/' in href or '/reel/' in href:
-                        continue
-                    
-                    # Extract username from href (remove leading/trailing slashes)
-                    username = href.strip('/').split('/')[0]
-                    
-                    # Skip if already processed or is post owner
-                    if not username or username in seen_usernames or username == post_data.get('owner_username'):
-                        continue
-                    
-                    # Get text content from the container
-                    text_content = await container.text_content()
-                    
-                    if not text_content or len(text_content.strip()) < 3:
-                        continue
-                    
-                    # Look for @ mentions in the text
-                    mentions = self.extract_mentions(text_content)
-                    
-                    # Only add if there are mentions (requirement for raffle)
-                    if mentions:
-                        comment_data = {
-                            'username': username,
-                            'text': text_content.strip()[:500],  # Limit text length
-                            'created_at': datetime.now(),
-                            'likes': 0,
-                            'tagged_users': mentions
-                        }
-                        comments.append(comment_data)
-                        seen_usernames.add(username)
-                    
-                except Exception as e:
-                    continue
+            found = []
+            if capture:
+                await capture.drain()
+                await capture.add_embedded(page)
+                found = list(capture.comments.values())
+                reached_checkpoint = reached_checkpoint or capture.reached_checkpoint
+                print(f"  📡 {len(found)} comentários capturados de {capture.responses} respostas da rede")
+                if not found:
+                    print("  ⚠️  Nenhum comentário capturado na rede, extraindo do DOM...")
+            
+            if not found:
+                found, reached_dom = await self.extract_dom_comments(page, frontier)
+                reached_checkpoint = reached_checkpoint or reached_dom
+            
+            remaining = stream.add(found)
+            if on_participants and remaining:
+                on_participants(remaining)
+            comments = stream.participants
+            seen_comment_ids = [comment['comment_id'] for comment in found if comment['comment_id']]
             
             post_data['participants'] = comments
             post_data['comments_count'] = len(comments)
+            post_data['checkpoint'] = {
+                'frontier_ids': seen_comment_ids,
+                'comments_seen': len(seen_comment_ids),
+                'reached_checkpoint': reached_checkpoint
+            }
             
-            print(f"✅ Collected {len(comments)} comments with mentions!")
+            await metrics.drain()
+            post_data['metrics'] = metrics.report()
+            post_data['scroll'] = scroll_stats
             
-            # Close page and browser context
-            await page.close()
-            print("🔒 Fechando navegador...")
-            await self.close_browser()
+            print(f"✅ Collected {len(comments)} comments with mentions!")
+            print(
+                f"📊 {post_data['metrics']['duration_ms']} ms | "
+                f"{post_data['metrics']['bytes_transferred'] / 1024:.0f} KB em {post_data['metrics']['requests']} requisições | "
+                f"{post_data['metrics']['blocked_requests']} bloqueadas"
+            )
             
             return post_data
             
         except Exception as e:
-            if page:
-                await page.close()
-            await self.close_browser()
             raise Exception(f"Failed to scrape post: {str(e)}")
+        finally:
+            # Only the page is closed, the context stays warm in the pool
+            try:
+                await page.close()
+            except Exception:
+                pass
 
 
 # Singleton instance
@@ -0,0 +1,138 @@
+"""
+Rate limiting for Instagram requests
+A token bucket shared by all validation workers plus adaptive backoff:
+the rate is cut (and all workers pause) when Instagram answers 429 /
+"please wait", and slowly recovers while requests succeed
+"""
+
+import threading
+import time
+from typing import Optional
+
+from instaloader.exceptions import TooManyRequestsException
+
+RATE_LIMIT_MARKERS = ("429", "too many requests", "please wait")
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is still rate limited after all retries"""
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether an exception is Instagram telling us to slow down"""
+    if isinstance(error, TooManyRequestsException):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `capacity` stored"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate: float):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Block until `tokens` are available; returns the time waited"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose rate adapts to Instagram's answers
+    - throttle(): multiplicative decrease and an exponential pause for every worker
+    - success(): additive increase back towards the configured rate
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        min_rate: float = 0.05,
+        backoff_factor: float = 0.5,
+        recovery_step: float = 0.05,
+        base_pause: float = 30.0,
+        max_pause: float = 600.0
+    ):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.base_pause = base_pause
+        self.max_pause = max_pause
+        self.bucket = TokenBucket(rate, burst)
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+        self.consecutive_throttles = 0
+        self.requests = 0
+        self.throttles = 0
+        self.waited = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def acquire(self):
+        """Wait for any backoff pause and for a token"""
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause <= 0:
+                break
+            time.sleep(pause)
+            self.waited += pause
+
+        self.waited += self.bucket.acquire()
+        self.requests += 1
+
+    def success(self):
+        """Request went through: recover the rate"""
+        with self.lock:
+            self.consecutive_throttles = 0
+            if self.rate < self.max_rate:
+                self.bucket.set_rate(min(self.max_rate, self.rate + self.recovery_step))
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """Instagram asked us to slow down: cut the rate and pause all workers"""
+        with self.lock:
+            self.throttles += 1
+            self.consecutive_throttles += 1
+            self.bucket.set_rate(max(self.min_rate, self.rate * self.backoff_factor))
+
+            pause = retry_after or min(
+                self.max_pause,
+                self.base_pause * 2 ** (self.consecutive_throttles - 1)
+            )
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+        print(f"🐢 Rate limited by Instagram: pausing {pause:.1f}s, rate now {self.rate:.2f} req/s")
+
+    def stats(self) -> dict:
+        return {
+            "rate": round(self.rate, 3),
+            "requests": self.requests,
+            "throttles": self.throttles,
+            "waited_seconds": round(self.waited, 1)
+        }
@@ -1,21 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional, Tuple
 from datetime import datetime
-import random
 
-from database import get_db
-from models import InstagramRaffle, InstagramParticipant
+from database import SessionLocal, get_async_db
+from models import InstagramRaffle, InstagramParticipant, DrawAuditLog, BackgroundJob, ScrapeCheckpoint
 from schemas import (
     InstagramRaffleCreate,
     InstagramRaffleResponse,
     InstagramParticipantResponse,
-    InstagramScrapeResponse,
     InstagramLoginRequest,
-    InstagramValidationResponse,
-    DrawResultResponse
+    JobResponse,
+    ImportSummaryResponse,
+    DrawResultResponse,
+    DrawVerificationResponse
 )
 from instagram_service import instagram_service
+from instagram_cache import profile_cache, follow_graph
+from draw_engine import MAX_WINNERS, draw_instagram_winners
+from jobs import enqueue_job, has_active_job
+from bulk_import import (
+    copy_instagram_participants, 
+    next_clone_number, 
+    stream_instagram_participants, 
+    write_instagram_comment_batch
+)
+from file_scraper import file_scraper
+from stream_import import import_comment_dump
+import instagram_jobs  # noqa: F401 - registers the scrape and validation job handlers
+from draw_audit import (
+    EMPTY_DIGEST, 
+    RaffleCompleted, 
+    new_secret, 
+    record_entries, 
+    prepare_draw, 
+    latest_audit, 
+    compute_instagram_digest, 
+    derive_seed, 
+    seeded_rng, 
+    build_verification
+)
 
 router = APIRouter(prefix="/api/instagram", tags=["instagram"])
 
@@ -30,79 +56,116 @@ def login_instagram(credentials: InstagramLoginRequest):
         raise HTTPException(status_code=401, detail="Instagram login failed")
 
 
+@router.get("/cache/stats")
+def instagram_cache_stats():
+    """Profile cache and follow graph counters, and the current request rate"""
+    return {
+        "profile_cache": profile_cache.stats(),
+        "follow_graph": follow_graph.stats(),
+        "rate_limiter": instagram_service.rate_limiter.stats()
+    }
+
+
 @router.post("/raffles/", response_model=InstagramRaffleResponse, status_code=201)
-def create_instagram_raffle(raffle: InstagramRaffleCreate, db: Session = Depends(get_db)):
+async def create_instagram_raffle(raffle: InstagramRaffleCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new raffle"""
     try:
         # Use raffle name as shortcode (sanitize it)
         shortcode = raffle.post_url.strip().replace(" ", "_")[:50]
         
         # Create raffle in database
+        draw_secret, seed_commitment = new_secret()
         db_raffle = InstagramRaffle(
             post_url=raffle.post_url,
             shortcode=shortcode,
             required_follows=raffle.required_follows,
             require_public_profile=raffle.require_public_profile,
             require_mutual_friends=raffle.require_mutual_friends,
-            status="collecting"
+            status="collecting",
+            draw_secret=draw_secret,
+            seed_commitment=seed_commitment,
+            entries_digest=EMPTY_DIGEST,
+            entries_count=0
         )
         db.add(db_raffle)
-        db.commit()
-        db.refresh(db_raffle)
+        await db.commit()
+        await db.refresh(db_raffle)
         
         return db_raffle
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/raffles/{raffle_id}/scrape", response_model=InstagramScrapeResponse)
-async def scrape_instagram_post(raffle_id: int, db: Session = Depends(get_db)):
-    """Import participants from base.txt file"""
-    raffle = db.query(InstagramRaffle).filter(InstagramRaffle.id == raffle_id).first()
+@router.post("/raffles/{raffle_id}/scrape", response_model=JobResponse, status_code=202)
+async def scrape_instagram_post(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Start scraping the raffle's post comments in the background
+    Participants are stored while comments load; follow progress on /api/jobs/{id}
+    """
+    raffle = await db.get(InstagramRaffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
+    if raffle.status == "completed":
+        raise HTTPException(status_code=400, detail="Cannot change participants of completed raffle")
+    
+    # Raffles named instead of linked to a post import from base.txt (/import-file)
+    try:
+        instagram_service.extract_shortcode(raffle.post_url)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Raffle has no Instagram post URL to scrape, import participants from a file instead")
+    
+    return await db.run_sync(enqueue_job, "scrape", raffle_id)
+
+
+def import_file_participants(raffle_id: int, comments: Iterable[dict]) -> Tuple[int, int, int]:
+    """Stream file participants into a raffle, chunk by chunk, with a sync session"""
+    with SessionLocal() as db:
+        return stream_instagram_participants(db, db.get(InstagramRaffle, raffle_id), comments)
+
+
+@router.post("/raffles/{raffle_id}/import-file", response_model=ImportSummaryResponse)
+async def import_instagram_file(
+    raffle_id: int,
+    file: Optional[UploadFile] = File(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Import participants from an uploaded username list, or from base.txt when no file is sent
+    Lines are read lazily and written chunk by chunk with INSERT ... ON CONFLICT DO NOTHING;
+    usernames already in the raffle (or repeated, ignoring case) are counted as skipped
+    """
+    raffle = await db.get(InstagramRaffle, raffle_id)
+    if not raffle:
+        raise HTTPException(status_code=404, detail="Raffle not found")
+    
+    if raffle.status == "completed":
+        raise HTTPException(status_code=400, detail="Cannot change participants of completed raffle")
+    
     try:
-        # Import from file instead of scraping
-        from file_scraper import file_scraper
-        
         print(f"📋 Starting file import for raffle {raffle_id}")
         
-        # Read participants from base.txt
-        post_data = file_scraper.read_participants_from_file()
-        
-        print(f"✅ Import completed, found {len(post_data.get('participants', []))} participants")
+        if file is not None:
+            comments = file_scraper.iter_comments(file.file, label=file.filename or 'upload')
+        else:
+            comments = file_scraper.iter_comments()
         
-        # Save participants to database
-        for participant_data in post_data['participants']:
-            # Check if participant already exists
-            existing = db.query(InstagramParticipant).filter(
-                InstagramParticipant.raffle_id == raffle_id,
-                InstagramParticipant.username == participant_data['username']
-            ).first()
-            
-            if not existing:
-                participant = InstagramParticipant(
-                    raffle_id=raffle_id,
-                    username=participant_data['username'],
-                    comment_text=participant_data['text'],
-                    tagged_users=participant_data['tagged_users'],
-                    comment_timestamp=participant_data['created_at']
-                )
-                db.add(participant)
+        # Reading, parsing and writing run on a worker thread with its own sync session, off the event loop
+        rows_read, inserted, batches = await run_in_threadpool(import_file_participants, raffle_id, comments)
         
-        raffle.status = "validating"
-        db.commit()
+        print(f"✅ Import completed: {rows_read} lidos, {inserted} inseridos, {rows_read - inserted} ignorados")
         
-        return InstagramScrapeResponse(
-            shortcode=post_data['shortcode'],
-            owner_username=post_data.get('owner_username', ''),
-            likes=post_data['likes'],
-            comments_count=post_data['comments_count'],
-            participants_found=len(post_data['participants']),
-            participants=post_data['participants']
+        return ImportSummaryResponse(
+            rows_read=rows_read,
+            inserted=inserted,
+            skipped=rows_read - inserted,
+            batches=batches
         )
     
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RaffleCompleted as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         error_detail = traceback.format_exc()
@@ -111,213 +174,251 @@ async def scrape_instagram_post(raffle_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to import from file: {str(e)}")
 
 
+@router.post("/raffles/{raffle_id}/import-comments", response_model=ImportSummaryResponse)
+async def import_instagram_comments(
+    raffle_id: int,
+    request: Request,
+    exported_at: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Stream a pasted comment dump (like backup.txt) into the raffle's participants
+    Relative times ("11 h", "3 d") are counted back from exported_at (default: now)
+    """
+    raffle = await db.get(InstagramRaffle, raffle_id)
+    if not raffle:
+        raise HTTPException(status_code=404, detail="Raffle not found")
+    
+    if raffle.status == "completed":
+        raise HTTPException(status_code=400, detail="Cannot change participants of completed raffle")
+    
+    return await import_comment_dump(
+        request.stream(),
+        lambda comments: db.run_sync(write_instagram_comment_batch, raffle_id, comments),
+        reference=exported_at
+    )
+
+
 @router.get("/raffles/{raffle_id}/participants", response_model=List[InstagramParticipantResponse])
-def get_raffle_participants(
+async def get_raffle_participants(
     raffle_id: int, 
     valid_only: bool = False,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all participants for a raffle"""
-    raffle = db.query(InstagramRaffle).filter(InstagramRaffle.id == raffle_id).first()
+    raffle = await db.get(InstagramRaffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
-    query = db.query(InstagramParticipant).filter(InstagramParticipant.raffle_id == raffle_id)
+    query = select(InstagramParticipant).where(InstagramParticipant.raffle_id == raffle_id)
     
     if valid_only:
-        query = query.filter(InstagramParticipant.is_valid == True)
+        query = query.where(InstagramParticipant.is_valid == True)
     
-    participants = query.all()
-    return participants
+    participants = await db.scalars(query)
+    return participants.all()
 
 
-@router.post("/raffles/{raffle_id}/validate", response_model=InstagramValidationResponse)
-def validate_participants(raffle_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    """Validate all participants against raffle rules"""
-    raffle = db.query(InstagramRaffle).filter(InstagramRaffle.id == raffle_id).first()
+@router.post("/raffles/{raffle_id}/validate", response_model=JobResponse, status_code=202)
+async def validate_participants(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Start (or return the running) background validation job for a raffle"""
+    raffle = await db.get(InstagramRaffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
-    participants = db.query(InstagramParticipant).filter(
-        InstagramParticipant.raffle_id == raffle_id,
-        InstagramParticipant.is_validated == False
-    ).all()
-    
-    valid_count = 0
-    invalid_count = 0
-    
-    for participant in participants:
-        # Validate participant
-        is_valid, errors = instagram_service.validate_participant(
-            username=participant.username,
-            tagged_users=participant.tagged_users,
-            required_follows=raffle.required_follows,
-            shortcode=raffle.shortcode,
-            require_public=raffle.require_public_profile,
-            require_mutual=raffle.require_mutual_friends
-        )
-        
-        participant.is_validated = True
-        participant.is_valid = is_valid
-        participant.validation_errors = errors if errors else None
-        
-        if is_valid:
-            valid_count += 1
-        else:
-            invalid_count += 1
-    
-    db.commit()
+    if raffle.status == "completed":
+        raise HTTPException(status_code=400, detail="Cannot change participants of completed raffle")
     
-    return InstagramValidationResponse(
-        total_participants=len(participants),
-        valid_participants=valid_count,
-        invalid_participants=invalid_count,
-        validation_complete=True
-    )
+    return await db.run_sync(enqueue_job, "validation", raffle_id)
 
 
 @router.post("/raffles/{raffle_id}/draw")
-def draw_instagram_raffle(raffle_id: int, db: Session = Depends(get_db)):
-    """Perform random draw from valid participants"""
-    raffle = db.query(InstagramRaffle).filter(InstagramRaffle.id == raffle_id).first()
+async def draw_instagram_raffle(
+    raffle_id: int, 
+    winners: int = Query(1, ge=1, le=MAX_WINNERS), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Perform random draw of `winners` distinct participants from valid participants"""
+    raffle = await db.get(InstagramRaffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
     if raffle.status == "completed":
         raise HTTPException(status_code=400, detail="Raffle already completed")
     
-    # Try to get valid participants first
-    valid_participants = db.query(InstagramParticipant).filter(
-        InstagramParticipant.raffle_id == raffle_id,
-        InstagramParticipant.is_valid == True
-    ).all()
+    if await db.run_sync(has_active_job, raffle_id):
+        raise HTTPException(status_code=409, detail="Raffle has a running job, wait for it or cancel it first")
+    
+    # The seed is fixed before sampling so the draw can be replayed by /verify
+    rng = await db.run_sync(prepare_draw, raffle)
     
-    # If no valid participants, use ALL participants
-    if not valid_participants:
+    # Valid participants first; if none are valid, ALL participants are eligible
+    drawn, total_participants, valid_only = await db.run_sync(draw_instagram_winners, raffle_id, winners, rng=rng)
+    if not drawn:
+        raise HTTPException(
+            status_code=400, 
+            detail="No participants found. Please import participants first."
+        )
+    
+    if not valid_only:
         print("⚠️  No validated participants, drawing from ALL participants")
-        all_participants = db.query(InstagramParticipant).filter(
-            InstagramParticipant.raffle_id == raffle_id
-        ).all()
-        
-        if not all_participants:
-            raise HTTPException(
-                status_code=400, 
-                detail="No participants found. Please import participants first."
-            )
-        
-        # Use all participants (no need to check for tagged users)
-        valid_participants = all_participants
-        print(f"✅ Drawing from {len(valid_participants)} participants")
+        print(f"✅ Drawing from {total_participants} participants")
+    
+    if total_participants < winners:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Only {total_participants} participants available, cannot draw {winners} winners"
+        )
     
-    # Randomly select winner
-    winner = random.choice(valid_participants)
-    winner.is_winner = True
+    for winner in drawn:
+        winner.is_winner = True
     
     # Update raffle status
     raffle.status = "completed"
     raffle.draw_date = datetime.utcnow()
     
-    db.commit()
-    db.refresh(winner)
+    db.add(DrawAuditLog(
+        raffle_type="instagram",
+        raffle_id=raffle_id,
+        seed=raffle.draw_seed,
+        entries_digest=raffle.entries_digest,
+        entries_count=raffle.entries_count,
+        params={"winners": winners},
+        winner_ids=[winner.id for winner in drawn]
+    ))
     
-    return {
-        "raffle_id": raffle_id,
-        "winner": {
+    await db.commit()
+    
+    winners_data = [
+        {
             "username": winner.username,
             "comment": winner.comment_text,
             "tagged_users": winner.tagged_users
-        },
+        }
+        for winner in drawn
+    ]
+    
+    return {
+        "raffle_id": raffle_id,
+        "winner": winners_data[0],
+        "winners": winners_data,
         "draw_date": raffle.draw_date,
-        "total_participants": len(valid_participants)
+        "draw_seed": raffle.draw_seed,
+        "total_participants": total_participants
     }
 
 
+@router.get("/raffles/{raffle_id}/verify", response_model=DrawVerificationResponse)
+async def verify_instagram_draw(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Reveal the draw secret and replay the draw to check the recorded winners"""
+    raffle = await db.get(InstagramRaffle, raffle_id)
+    if not raffle:
+        raise HTTPException(status_code=404, detail="Raffle not found")
+    
+    audit = await db.run_sync(latest_audit, "instagram", raffle_id)
+    if raffle.status != "completed" or not audit:
+        raise HTTPException(status_code=400, detail="Raffle has not been drawn yet")
+    
+    digest, count = await db.run_sync(compute_instagram_digest, raffle_id)
+    replayed, _, _ = await db.run_sync(
+        draw_instagram_winners, 
+        raffle_id, 
+        audit.params["winners"], 
+        rng=seeded_rng(derive_seed(raffle.draw_secret, digest, count))
+    )
+    
+    return build_verification(raffle, audit, digest, count, [participant.id for participant in replayed])
+
+
 @router.get("/raffles/", response_model=List[InstagramRaffleResponse])
-def list_instagram_raffles(db: Session = Depends(get_db)):
+async def list_instagram_raffles(db: AsyncSession = Depends(get_async_db)):
     """List all Instagram raffles"""
-    raffles = db.query(InstagramRaffle).all()
-    return raffles
+    raffles = await db.scalars(select(InstagramRaffle))
+    return raffles.all()
 
 
 @router.get("/raffles/{raffle_id}", response_model=InstagramRaffleResponse)
-def get_instagram_raffle(raffle_id: int, db: Session = Depends(get_db)):
+async def get_instagram_raffle(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get Instagram raffle details"""
-    raffle = db.query(InstagramRaffle).filter(InstagramRaffle.id == raffle_id).first()
+    raffle = await db.get(InstagramRaffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     return raffle
 
 
 @router.delete("/raffles/{raffle_id}")
-def delete_instagram_raffle(raffle_id: int, db: Session = Depends(get_db)):
-    """Delete an Instagram raffle and all its participants"""
-    raffle = db.query(InstagramRaffle).filter(InstagramRaffle.id == raffle_id).first()
+async def delete_instagram_raffle(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Delete an Instagram raffle with its participants, checkpoint, jobs and audit log"""
+    raffle = await db.get(InstagramRaffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
-    # Delete all participants first
-    db.query(InstagramParticipant).filter(InstagramParticipant.raffle_id == raffle_id).delete()
+    if await db.run_sync(has_active_job, raffle_id):
+        raise HTTPException(status_code=409, detail="Raffle has a running job, cancel it first")
+    
+    # Delete dependent rows first, a reused id must not inherit them
+    await db.execute(delete(InstagramParticipant).where(InstagramParticipant.raffle_id == raffle_id))
+    await db.execute(delete(ScrapeCheckpoint).where(ScrapeCheckpoint.raffle_id == raffle_id))
+    await db.execute(delete(BackgroundJob).where(BackgroundJob.raffle_id == raffle_id))
+    await db.execute(delete(DrawAuditLog).where(
+        DrawAuditLog.raffle_type == "instagram",
+        DrawAuditLog.raffle_id == raffle_id
+    ))
     
     # Delete the raffle
-    db.delete(raffle)
-    db.commit()
+    await db.delete(raffle)
+    await db.commit()
     
     return {"message": "Raffle deleted successfully", "raffle_id": raffle_id}
 
 
 @router.post("/raffles/{raffle_id}/duplicate", response_model=InstagramRaffleResponse)
-def duplicate_instagram_raffle(raffle_id: int, db: Session = Depends(get_db)):
-    """Duplicate an Instagram raffle with all its participants"""
+async def duplicate_instagram_raffle(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Duplicate an Instagram raffle with all its participants
+    Participants are copied inside the database with one INSERT ... SELECT, in the
+    same transaction as the new raffle
+    """
     # Get the original raffle
-    original_raffle = db.query(InstagramRaffle).filter(InstagramRaffle.id == raffle_id).first()
+    original_raffle = await db.get(InstagramRaffle, raffle_id)
     if not original_raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
-    # Get all participants from the original raffle
-    original_participants = db.query(InstagramParticipant).filter(
-        InstagramParticipant.raffle_id == raffle_id
-    ).all()
-    
-    if not original_participants:
+    has_participants = await db.scalar(select(exists().where(InstagramParticipant.raffle_id == raffle_id)))
+    if not has_participants:
         raise HTTPException(status_code=400, detail="No participants found in original raffle")
     
-    # Count existing duplicates to generate unique shortcode
-    existing_raffles = db.query(InstagramRaffle).filter(
-        InstagramRaffle.shortcode.like(f"{original_raffle.shortcode}%")
-    ).count()
+    # Copies are numbered within the lineage of the first raffle
+    root_id = original_raffle.clone_root_id or original_raffle.id
+    root_raffle = await db.get(InstagramRaffle, root_id) or original_raffle
+    clone_number = await db.run_sync(next_clone_number, InstagramRaffle, root_id)
     
-    # Create new raffle
+    # Create new raffle (same entries, so the digest carries over; the secret is fresh)
+    draw_secret, seed_commitment = new_secret()
+    if original_raffle.entries_digest is None:
+        await db.run_sync(record_entries, original_raffle, [])
     new_raffle = InstagramRaffle(
         post_url=original_raffle.post_url,
-        shortcode=f"{original_raffle.shortcode}_#{existing_raffles}",
+        shortcode=f"{root_raffle.shortcode}_#{clone_number}",
         post_owner=original_raffle.post_owner,
         required_follows=original_raffle.required_follows,
         require_public_profile=original_raffle.require_public_profile,
         require_mutual_friends=original_raffle.require_mutual_friends,
-        status="validating"  # Start as validating since participants are already imported
+        status="validating",  # Start as validating since participants are already imported
+        draw_secret=draw_secret,
+        seed_commitment=seed_commitment,
+        entries_digest=original_raffle.entries_digest,
+        entries_count=original_raffle.entries_count,
+        clone_root_id=root_id
     )
     db.add(new_raffle)
-    db.flush()  # Get the new raffle ID
-    
-    # Duplicate all participants
-    for original_participant in original_participants:
-        new_participant = InstagramParticipant(
-            raffle_id=new_raffle.id,
-            username=original_participant.username,
-            comment_text=original_participant.comment_text,
-            tagged_users=original_participant.tagged_users,
-            comment_timestamp=original_participant.comment_timestamp,
-            is_validated=original_participant.is_validated,
-            is_valid=original_participant.is_valid,
-            validation_errors=original_participant.validation_errors,
-            profile_public=original_participant.profile_public,
-            follows_required=original_participant.follows_required,
-            is_winner=False  # Reset winner status
-        )
-        db.add(new_participant)
+    await db.flush()  # Get the new raffle ID
+    
+    # Duplicate all participants (validation results kept, winners reset)
+    await db.run_sync(copy_instagram_participants, raffle_id, new_raffle.id)
     
-    db.commit()
-    db.refresh(new_raffle)
+    await db.commit()
+    await db.refresh(new_raffle)
     
     return new_raffle
 
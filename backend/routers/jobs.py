@@ -0,0 +1,62 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_db, AsyncSessionLocal
+from models import BackgroundJob
+from schemas import JobResponse
+from jobs import FINISHED_STATUSES
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+EVENT_POLL_INTERVAL = 1.0
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get job status and progress"""
+    job = await db.get(BackgroundJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Stream job progress as Server-Sent Events until the job finishes"""
+    if not await db.get(BackgroundJob, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last_payload = None
+        while True:
+            async with AsyncSessionLocal() as session:
+                job = await session.get(BackgroundJob, job_id)
+                payload = JobResponse.model_validate(job).model_dump_json()
+            
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+            
+            if job.status in FINISHED_STATUSES:
+                break
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Request cancellation of a pending or running job"""
+    job = await db.get(BackgroundJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job.status not in FINISHED_STATUSES:
+        job.cancel_requested = True
+        await db.commit()
+        await db.refresh(job)
+    
+    return job
@@ -1,39 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from database import get_async_db
 from models import Participant
-from schemas import ParticipantCreate, ParticipantResponse
+from schemas import ParticipantCreate, ParticipantResponse, ImportSummaryResponse
+from bulk_import import write_participant_batch
+from stream_import import detect_format, import_stream
 
 router = APIRouter(prefix="/api/participants", tags=["participants"])
 
 
 @router.post("/", response_model=ParticipantResponse, status_code=201)
-def create_participant(participant: ParticipantCreate, db: Session = Depends(get_db)):
+async def create_participant(participant: ParticipantCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new participant"""
     # Check if email already exists
-    existing = db.query(Participant).filter(Participant.email == participant.email).first()
+    existing = await db.scalar(select(Participant).where(Participant.email == participant.email))
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     db_participant = Participant(**participant.model_dump())
     db.add(db_participant)
-    db.commit()
-    db.refresh(db_participant)
+    await db.commit()
+    await db.refresh(db_participant)
     return db_participant
 
 
+@router.post("/import", response_model=ImportSummaryResponse)
+async def import_participants(
+    request: Request, 
+    format: Optional[str] = None, 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream participants from a CSV or NDJSON upload (fields: name, email, phone)"""
+    try:
+        fmt = detect_format(format, request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return await import_stream(
+        request.stream(), 
+        fmt, 
+        ParticipantCreate, 
+        lambda rows: db.run_sync(write_participant_batch, rows)
+    )
+
+
 @router.get("/", response_model=List[ParticipantResponse])
-def list_participants(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def list_participants(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """List all participants"""
-    participants = db.query(Participant).offset(skip).limit(limit).all()
-    return participants
+    participants = await db.scalars(select(Participant).offset(skip).limit(limit))
+    return participants.all()
 
 
 @router.get("/{participant_id}", response_model=ParticipantResponse)
-def get_participant(participant_id: int, db: Session = Depends(get_db)):
+async def get_participant(participant_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get participant details"""
-    participant = db.query(Participant).filter(Participant.id == participant_id).first()
+    participant = await db.get(Participant, participant_id)
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
     return participant
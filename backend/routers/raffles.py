@@ -1,96 +1,144 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import exists, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
 from datetime import datetime
-import random
-from database import get_db
-from models import Raffle, Ticket, Participant
+from database import get_async_db
+from models import Raffle, Ticket, Participant, DrawAuditLog
 from schemas import (
     RaffleCreate, 
     RaffleResponse, 
     TicketResponse, 
     AssignTicketsRequest,
-    DrawResultResponse
+    TicketAssignment,
+    BulkAssignTicketsResponse,
+    ImportSummaryResponse,
+    DrawResultResponse,
+    DrawVerificationResponse
+)
+from bulk_import import (
+    copy_tickets, 
+    find_missing_participants, 
+    find_taken_ticket_numbers, 
+    insert_tickets, 
+    next_clone_number, 
+    write_ticket_batch
+)
+from stream_import import detect_format, import_stream
+from draw_engine import MAX_WINNERS, draw_ticket_winners
+from draw_audit import (
+    EMPTY_DIGEST, 
+    new_secret, 
+    record_entries, 
+    ticket_entry, 
+    prepare_draw, 
+    latest_audit, 
+    compute_ticket_digest, 
+    derive_seed, 
+    seeded_rng, 
+    build_verification
 )
 
 router = APIRouter(prefix="/api/raffles", tags=["raffles"])
 
 
+async def load_tickets(db: AsyncSession, ticket_ids: List[int]) -> List[Ticket]:
+    """Load tickets with their participant, keeping the given order"""
+    result = await db.scalars(
+        select(Ticket).where(Ticket.id.in_(ticket_ids)).options(selectinload(Ticket.participant))
+    )
+    tickets = {ticket.id: ticket for ticket in result}
+    return [tickets[ticket_id] for ticket_id in ticket_ids]
+
+
 @router.post("/", response_model=RaffleResponse, status_code=201)
-def create_raffle(raffle: RaffleCreate, db: Session = Depends(get_db)):
+async def create_raffle(raffle: RaffleCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new raffle"""
-    db_raffle = Raffle(**raffle.model_dump())
+    draw_secret, seed_commitment = new_secret()
+    db_raffle = Raffle(
+        **raffle.model_dump(),
+        draw_secret=draw_secret,
+        seed_commitment=seed_commitment,
+        entries_digest=EMPTY_DIGEST,
+        entries_count=0
+    )
     db.add(db_raffle)
-    db.commit()
-    db.refresh(db_raffle)
+    await db.commit()
+    await db.refresh(db_raffle)
     return db_raffle
 
 
 @router.get("/", response_model=List[RaffleResponse])
-def list_raffles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def list_raffles(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """List all raffles"""
-    raffles = db.query(Raffle).offset(skip).limit(limit).all()
-    return raffles
+    raffles = await db.scalars(select(Raffle).offset(skip).limit(limit))
+    return raffles.all()
 
 
 @router.get("/{raffle_id}", response_model=RaffleResponse)
-def get_raffle(raffle_id: int, db: Session = Depends(get_db)):
+async def get_raffle(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get raffle details"""
-    raffle = db.query(Raffle).filter(Raffle.id == raffle_id).first()
+    raffle = await db.get(Raffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     return raffle
 
 
 @router.get("/{raffle_id}/tickets", response_model=List[TicketResponse])
-def get_raffle_tickets(raffle_id: int, db: Session = Depends(get_db)):
+async def get_raffle_tickets(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get all tickets for a raffle"""
-    raffle = db.query(Raffle).filter(Raffle.id == raffle_id).first()
+    raffle = await db.get(Raffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
-    tickets = db.query(Ticket).filter(Ticket.raffle_id == raffle_id).all()
-    return tickets
+    tickets = await db.scalars(
+        select(Ticket).where(Ticket.raffle_id == raffle_id).options(selectinload(Ticket.participant))
+    )
+    return tickets.all()
+
+
+async def ticket_conflict(db: AsyncSession, raffle_id: int, tickets: List[TicketAssignment]) -> HTTPException:
+    """Error for a ticket insert rejected by the unique index"""
+    numbers = [t.ticket_number for t in tickets]
+    taken = await db.run_sync(find_taken_ticket_numbers, raffle_id, numbers)
+    if taken:
+        return HTTPException(status_code=400, detail=f"Ticket number {min(taken)} already assigned")
+    
+    repeated = [number for number, count in Counter(numbers).items() if count > 1]
+    if repeated:
+        return HTTPException(status_code=400, detail=f"Ticket number {min(repeated)} repeated in request")
+    
+    return HTTPException(status_code=409, detail="Tickets conflict with a concurrent change, please retry")
 
 
 @router.post("/{raffle_id}/assign-tickets", response_model=List[TicketResponse])
-def assign_tickets(
+async def assign_tickets(
     raffle_id: int, 
     request: AssignTicketsRequest, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Assign tickets to participants for a raffle"""
-    raffle = db.query(Raffle).filter(Raffle.id == raffle_id).first()
+    raffle = await db.get(Raffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
     if raffle.status == "completed":
         raise HTTPException(status_code=400, detail="Cannot assign tickets to completed raffle")
     
+    # Verify every participant exists
+    missing = await db.run_sync(find_missing_participants, [t.participant_id for t in request.tickets])
+    if missing:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Participant {min(missing)} not found"
+        )
+    
     created_tickets = []
     for ticket_assignment in request.tickets:
-        # Verify participant exists
-        participant = db.query(Participant).filter(
-            Participant.id == ticket_assignment.participant_id
-        ).first()
-        if not participant:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Participant {ticket_assignment.participant_id} not found"
-            )
-        
-        # Check if ticket number already exists for this raffle
-        existing_ticket = db.query(Ticket).filter(
-            Ticket.raffle_id == raffle_id,
-            Ticket.ticket_number == ticket_assignment.ticket_number
-        ).first()
-        if existing_ticket:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Ticket number {ticket_assignment.ticket_number} already assigned"
-            )
-        
-        # Create ticket
+        # Create ticket (duplicate numbers are caught by the unique index on commit)
         ticket = Ticket(
             ticket_number=ticket_assignment.ticket_number,
             participant_id=ticket_assignment.participant_id,
@@ -101,86 +149,225 @@ def assign_tickets(
     
     # Update raffle status to active
     raffle.status = "active"
-    db.commit()
+    try:
+        # Recording the entries flushes the tickets
+        await db.run_sync(record_entries, raffle, [
+            ticket_entry(ticket.participant_id, ticket.ticket_number) for ticket in created_tickets
+        ])
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise await ticket_conflict(db, raffle_id, request.tickets)
     
-    # Refresh all tickets to get relationships
-    for ticket in created_tickets:
-        db.refresh(ticket)
+    # Reload all tickets with their participants
+    return await load_tickets(db, [ticket.id for ticket in created_tickets])
+
+
+@router.post("/{raffle_id}/assign-tickets/bulk", response_model=BulkAssignTicketsResponse)
+async def bulk_assign_tickets(
+    raffle_id: int, 
+    request: AssignTicketsRequest, 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Assign a large batch of tickets with set-based validation and chunked inserts"""
+    raffle = await db.get(Raffle, raffle_id)
+    if not raffle:
+        raise HTTPException(status_code=404, detail="Raffle not found")
     
-    return created_tickets
+    if raffle.status == "completed":
+        raise HTTPException(status_code=400, detail="Cannot assign tickets to completed raffle")
+    
+    # Reject ticket numbers repeated inside the request itself
+    seen_numbers = set()
+    for ticket_assignment in request.tickets:
+        if ticket_assignment.ticket_number in seen_numbers:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Ticket number {ticket_assignment.ticket_number} repeated in request"
+            )
+        seen_numbers.add(ticket_assignment.ticket_number)
+    
+    # Validate every participant and ticket number with a few IN (...) queries
+    missing = await db.run_sync(find_missing_participants, [t.participant_id for t in request.tickets])
+    if missing:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Participant {min(missing)} not found"
+        )
+    
+    taken = await db.run_sync(find_taken_ticket_numbers, raffle_id, seen_numbers)
+    if taken:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Ticket number {min(taken)} already assigned"
+        )
+    
+    # Update raffle status to active
+    raffle.status = "active"
+    try:
+        tickets_assigned = await db.run_sync(insert_tickets, raffle, request.tickets)
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request took a number after the check above
+        await db.rollback()
+        raise await ticket_conflict(db, raffle_id, request.tickets)
+    
+    return BulkAssignTicketsResponse(raffle_id=raffle_id, tickets_assigned=tickets_assigned)
+
+
+@router.post("/{raffle_id}/import-tickets", response_model=ImportSummaryResponse)
+async def import_tickets(
+    raffle_id: int, 
+    request: Request, 
+    format: Optional[str] = None, 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream tickets from a CSV or NDJSON upload (fields: participant_id, ticket_number)"""
+    raffle = await db.get(Raffle, raffle_id)
+    if not raffle:
+        raise HTTPException(status_code=404, detail="Raffle not found")
+    
+    if raffle.status == "completed":
+        raise HTTPException(status_code=400, detail="Cannot assign tickets to completed raffle")
+    
+    try:
+        fmt = detect_format(format, request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return await import_stream(
+        request.stream(), 
+        fmt, 
+        TicketAssignment, 
+        lambda rows: db.run_sync(write_ticket_batch, raffle_id, rows)
+    )
 
 
 @router.post("/{raffle_id}/draw", response_model=DrawResultResponse)
-def draw_raffle(raffle_id: int, db: Session = Depends(get_db)):
-    """Perform a random draw for the raffle"""
-    raffle = db.query(Raffle).filter(Raffle.id == raffle_id).first()
+async def draw_raffle(
+    raffle_id: int, 
+    winners: int = Query(1, ge=1, le=MAX_WINNERS), 
+    weighted: bool = True, 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Perform a random draw for the raffle
+    Draws `winners` distinct participants; with weighted=true each participant's
+    chance is proportional to their ticket count, otherwise every participant counts once
+    """
+    raffle = await db.get(Raffle, raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
     if raffle.status == "completed":
         raise HTTPException(status_code=400, detail="Raffle already completed")
     
-    # Get all tickets for this raffle
-    tickets = db.query(Ticket).filter(Ticket.raffle_id == raffle_id).all()
-    if not tickets:
+    # The seed is fixed before sampling so the draw can be replayed by /verify
+    rng = await db.run_sync(prepare_draw, raffle)
+    winner_tickets, eligible = await db.run_sync(draw_ticket_winners, raffle_id, winners, weighted, rng=rng)
+    if eligible and eligible < winners:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Only {eligible} participants have tickets, cannot draw {winners} winners"
+        )
+    
+    if not winner_tickets:
         raise HTTPException(status_code=400, detail="No tickets assigned to this raffle")
     
-    # Randomly select a winner
-    winner_ticket = random.choice(tickets)
-    winner_ticket.is_winner = True
+    for winner_ticket in winner_tickets:
+        winner_ticket.is_winner = True
     
     # Update raffle status
     raffle.status = "completed"
     raffle.draw_date = datetime.utcnow()
     
-    db.commit()
-    db.refresh(winner_ticket)
+    db.add(DrawAuditLog(
+        raffle_type="ticket",
+        raffle_id=raffle_id,
+        seed=raffle.draw_seed,
+        entries_digest=raffle.entries_digest,
+        entries_count=raffle.entries_count,
+        params={"winners": winners, "weighted": weighted},
+        winner_ids=[winner_ticket.id for winner_ticket in winner_tickets]
+    ))
+    
+    await db.commit()
+    winner_tickets = await load_tickets(db, [winner_ticket.id for winner_ticket in winner_tickets])
     
     return DrawResultResponse(
         raffle_id=raffle_id,
-        winner_ticket=winner_ticket,
-        draw_date=raffle.draw_date
+        winner_ticket=winner_tickets[0],
+        winner_tickets=winner_tickets,
+        draw_date=raffle.draw_date,
+        draw_seed=raffle.draw_seed
+    )
+
+
+@router.get("/{raffle_id}/verify", response_model=DrawVerificationResponse)
+async def verify_raffle_draw(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Reveal the draw secret and replay the draw to check the recorded winners"""
+    raffle = await db.get(Raffle, raffle_id)
+    if not raffle:
+        raise HTTPException(status_code=404, detail="Raffle not found")
+    
+    audit = await db.run_sync(latest_audit, "ticket", raffle_id)
+    if raffle.status != "completed" or not audit:
+        raise HTTPException(status_code=400, detail="Raffle has not been drawn yet")
+    
+    digest, count = await db.run_sync(compute_ticket_digest, raffle_id)
+    replayed, _ = await db.run_sync(
+        draw_ticket_winners, 
+        raffle_id, 
+        audit.params["winners"], 
+        audit.params["weighted"], 
+        rng=seeded_rng(derive_seed(raffle.draw_secret, digest, count))
     )
+    
+    return build_verification(raffle, audit, digest, count, [ticket.id for ticket in replayed])
 
 
 @router.post("/{raffle_id}/duplicate", response_model=RaffleResponse)
-def duplicate_raffle(raffle_id: int, db: Session = Depends(get_db)):
-    """Duplicate a raffle with all its participants and tickets"""
+async def duplicate_raffle(raffle_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Duplicate a raffle with all its participants and tickets
+    Tickets are copied inside the database with one INSERT ... SELECT, in the same
+    transaction as the new raffle
+    """
     # Get the original raffle
-    original_raffle = db.query(Raffle).filter(Raffle.id == raffle_id).first()
+    original_raffle = await db.get(Raffle, raffle_id)
     if not original_raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
     
-    # Get all tickets from the original raffle
-    original_tickets = db.query(Ticket).filter(Ticket.raffle_id == raffle_id).all()
-    if not original_tickets:
+    has_tickets = await db.scalar(select(exists().where(Ticket.raffle_id == raffle_id)))
+    if not has_tickets:
         raise HTTPException(status_code=400, detail="No tickets found in original raffle")
     
-    # Count existing duplicates to generate unique name
-    existing_raffles = db.query(Raffle).filter(
-        Raffle.name.like(f"{original_raffle.name}%")
-    ).count()
+    # Copies are numbered within the lineage of the first raffle
+    root_id = original_raffle.clone_root_id or original_raffle.id
+    root_raffle = await db.get(Raffle, root_id) or original_raffle
+    clone_number = await db.run_sync(next_clone_number, Raffle, root_id)
     
-    # Create new raffle
+    # Create new raffle (same entries, so the digest carries over; the secret is fresh)
+    draw_secret, seed_commitment = new_secret()
+    if original_raffle.entries_digest is None:
+        await db.run_sync(record_entries, original_raffle, [])
     new_raffle = Raffle(
-        name=f"{original_raffle.name} - Sorteio #{existing_raffles}",
+        name=f"{root_raffle.name} - Sorteio #{clone_number}",
         description=original_raffle.description,
-        status="active"
+        status="active",
+        draw_secret=draw_secret,
+        seed_commitment=seed_commitment,
+        entries_digest=original_raffle.entries_digest,
+        entries_count=original_raffle.entries_count,
+        clone_root_id=root_id
     )
     db.add(new_raffle)
-    db.flush()  # Get the new raffle ID
+    await db.flush()  # Get the new raffle ID
     
     # Duplicate all tickets with the same participants
-    for original_ticket in original_tickets:
-        new_ticket = Ticket(
-            ticket_number=original_ticket.ticket_number,
-            participant_id=original_ticket.participant_id,
-            raffle_id=new_raffle.id,
-            is_winner=False
-        )
-        db.add(new_ticket)
+    await db.run_sync(copy_tickets, raffle_id, new_raffle.id)
     
-    db.commit()
-    db.refresh(new_raffle)
+    await db.commit()
+    await db.refresh(new_raffle)
     
     return new_raffle
@@ -34,6 +34,10 @@ class RaffleResponse(BaseModel):
     draw_date: Optional[datetime]
     status: str
     created_at: datetime
+    seed_commitment: Optional[str] = None
+    entries_digest: Optional[str] = None
+    entries_count: Optional[int] = None
+    draw_seed: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -61,11 +65,46 @@ class AssignTicketsRequest(BaseModel):
     tickets: List[TicketAssignment]
 
 
+class BulkAssignTicketsResponse(BaseModel):
+    raffle_id: int
+    tickets_assigned: int
+
+
+# Import Schemas
+class ImportSummaryResponse(BaseModel):
+    rows_read: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    batches: int = 0
+    errors: List[str] = []
+
+
 # Draw Result Schema
 class DrawResultResponse(BaseModel):
     raffle_id: int
     winner_ticket: TicketResponse
+    winner_tickets: List[TicketResponse] = []  # All winners in draw order (first one is winner_ticket)
     draw_date: datetime
+    draw_seed: Optional[str] = None
+
+
+class DrawVerificationResponse(BaseModel):
+    raffle_id: int
+    seed_commitment: str
+    draw_secret: str
+    draw_seed: str
+    entries_digest: str
+    entries_count: int
+    recomputed_digest: str
+    recomputed_count: int
+    winner_ids: List[int]
+    replayed_winner_ids: List[int]
+    commitment_valid: bool
+    digest_valid: bool
+    seed_valid: bool
+    winners_valid: bool
+    verified: bool
 
 
 # Instagram Schemas
@@ -87,6 +126,10 @@ class InstagramRaffleResponse(BaseModel):
     status: str
     draw_date: Optional[datetime]
     created_at: datetime
+    seed_commitment: Optional[str] = None
+    entries_digest: Optional[str] = None
+    entries_count: Optional[int] = None
+    draw_seed: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -106,22 +149,25 @@ class InstagramParticipantResponse(BaseModel):
         from_attributes = True
 
 
-class InstagramScrapeResponse(BaseModel):
-    shortcode: str
-    owner_username: str
-    likes: int
-    comments_count: int
-    participants_found: int
-    participants: List[dict]
-
-
 class InstagramLoginRequest(BaseModel):
     username: str
     password: str
 
 
-class InstagramValidationResponse(BaseModel):
-    total_participants: int
-    valid_participants: int
-    invalid_participants: int
-    validation_complete: bool
+# Background Job Schemas
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    raffle_id: Optional[int]
+    status: str
+    total: int
+    processed: int
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
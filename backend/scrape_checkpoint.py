@@ -0,0 +1,66 @@
+"""
+Per-post scrape checkpoints
+Each complete scrape records the newest comment ids it saw; the next scrape
+of the raffle stops once it reaches them and only appends the newer comments
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import InstagramRaffle, ScrapeCheckpoint
+
+# Comment ids kept as stop markers for the next run
+FRONTIER_SIZE = 50
+
+# Scroll stop reasons after which every comment newer than the frontier was seen
+# (time_budget, target, error or cancelled leave older comments unread)
+COMPLETE_STOP_REASONS = {"end_of_list", "checkpoint"}
+
+
+def load_checkpoint(db: Session, raffle_id: int) -> Optional[Dict]:
+    """Checkpoint to hand to the scraper, None on the first scrape"""
+    checkpoint = db.scalar(select(ScrapeCheckpoint).where(ScrapeCheckpoint.raffle_id == raffle_id))
+    if not checkpoint:
+        return None
+    return {
+        'frontier_ids': checkpoint.frontier_ids or [],
+        'comments_seen': checkpoint.comments_seen
+    }
+
+
+def merge_frontier(new_ids: List[str], old_ids: List[str]) -> List[str]:
+    """Newest ids first, without duplicates, capped at FRONTIER_SIZE"""
+    return list(dict.fromkeys(new_ids + old_ids))[:FRONTIER_SIZE]
+
+
+def save_checkpoint(db: Session, raffle: InstagramRaffle, shortcode: str, scraped: Dict):
+    """Store the scraper's checkpoint output for the next run"""
+    checkpoint = db.scalar(select(ScrapeCheckpoint).where(ScrapeCheckpoint.raffle_id == raffle.id))
+    if not checkpoint:
+        checkpoint = ScrapeCheckpoint(raffle_id=raffle.id, shortcode=shortcode, frontier_ids=[], comments_seen=0, runs=0)
+        db.add(checkpoint)
+    
+    checkpoint.shortcode = shortcode
+    checkpoint.frontier_ids = merge_frontier(scraped.get('frontier_ids', []), checkpoint.frontier_ids or [])
+    checkpoint.comments_seen = (checkpoint.comments_seen or 0) + scraped.get('comments_seen', 0)
+    checkpoint.runs = (checkpoint.runs or 0) + 1
+    checkpoint.updated_at = datetime.utcnow()
+
+
+def finish_scrape(db: Session, raffle: InstagramRaffle, post_data: Dict):
+    """
+    Advance the raffle's checkpoint once its participants are stored
+    A partial scroll keeps the old frontier, otherwise the next run would stop
+    at the new one and never read the older comments this run skipped
+    """
+    stop_reason = post_data.get('scroll', {}).get('stop_reason')
+    if post_data.get('checkpoint') and stop_reason in COMPLETE_STOP_REASONS:
+        save_checkpoint(db, raffle, post_data['shortcode'], post_data['checkpoint'])
+    elif post_data.get('checkpoint'):
+        print(f"⚠️  Scroll parou antes do fim ({stop_reason}), checkpoint mantido para o raffle {raffle.id}")
+    raffle.status = "validating"
+    db.commit()
+
@@ -0,0 +1,49 @@
+"""
+Event loop thread for browser scraping
+Job handlers run on worker threads, but Playwright objects (and the browser
+pool) belong to the loop that created them: every scrape is submitted to this
+one long-lived loop, so warm browsers are reused across jobs
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Optional
+
+from browser_pool import browser_pool
+
+
+class ScrapeRunner:
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self.loop.run_forever, name="scraper", daemon=True)
+                self.thread.start()
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Run a coroutine on the scraper loop, returns a thread-safe future"""
+        self._start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def shutdown(self, timeout: float = 10):
+        """Close the warm browsers and stop the loop"""
+        if self.loop is None:
+            return
+        try:
+            self.submit(browser_pool.close()).result(timeout)
+        except Exception as e:
+            print(f"⚠️  Error closing browser pool: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        self.loop = None
+        self.thread = None
+
+
+# Singleton instance
+scrape_runner = ScrapeRunner()
@@ -0,0 +1,211 @@
+"""
+Adaptive scroll controller for the comments page
+Scrolls while DOM mutations (or captured comments) show progress, waits longer
+when nothing arrives, pauses when Instagram throttles, and stops on a real
+end-of-list signal, the target comment count, the checkpoint, the time budget
+or a cancellation
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Iterable, Optional
+
+SCRAPE_TIME_BUDGET = float(os.getenv("SCRAPE_TIME_BUDGET", "300"))  # seconds
+MIN_WAIT = 0.3  # seconds to wait for new comments after a scroll
+MAX_WAIT = 4.0
+IDLE_PATIENCE = 2  # rounds at MAX_WAIT with no change, no loader and no "load more"
+THROTTLE_PAUSE = 5.0
+MAX_THROTTLE_PAUSE = 60.0
+MAX_STEP_ERRORS = 3
+
+# One round trip per round: scroll, click a real "load more" control, report progress
+# A MutationObserver counts added nodes so progress is measured, not guessed
+SCROLL_STEP_JS = '''
+    (args) => {
+        if (!window.__scrollState) {
+            const state = {mutations: 0};
+            new MutationObserver(records => {
+                for (const record of records) state.mutations += record.addedNodes.length;
+            }).observe(document.body, {childList: true, subtree: true});
+            window.__scrollState = state;
+        }
+
+        window.scrollTo(0, document.body.scrollHeight);
+        document.querySelectorAll('div[style*="overflow"], article, main').forEach(el => {
+            if (el.scrollHeight > el.clientHeight) el.scrollTop = el.scrollHeight;
+        });
+
+        const loadMorePattern = /^(load|view|ver|carregar) (more|mais)( comments| comentários)?$/i;
+        const loadMore = Array.from(document.querySelectorAll('button, div[role="button"], svg[aria-label]'))
+            .find(el => {
+                const label = (el.getAttribute('aria-label') || el.textContent || '').trim();
+                return label.length <= 40 && loadMorePattern.test(label);
+            });
+        if (loadMore) (loadMore.closest('button, [role="button"]') || loadMore).click();
+
+        return {
+            mutations: window.__scrollState.mutations,
+            comments: document.querySelectorAll('a[href*="/c/"]').length,
+            loading: !!document.querySelector('[role="progressbar"], svg[aria-label="Loading..."], svg[aria-label="Carregando..."]'),
+            clicked: !!loadMore,
+            reachedFrontier: args.frontier.some(id => document.querySelector(`a[href*="/c/${id}/"]`))
+        };
+    }
+'''
+
+MUTATIONS_SINCE_JS = '(previous) => window.__scrollState && window.__scrollState.mutations > previous'
+
+
+class ScrollController:
+    """Loads comments by scrolling until a stop condition is met"""
+
+    def __init__(
+        self,
+        page,
+        capture=None,
+        frontier: Iterable[str] = (),
+        target_comments: Optional[int] = None,
+        time_budget: float = SCRAPE_TIME_BUDGET,
+        min_wait: float = MIN_WAIT,
+        max_wait: float = MAX_WAIT,
+        patience: int = IDLE_PATIENCE,
+        on_round: Optional[Callable[[], Awaitable[None]]] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ):
+        self.page = page
+        self.capture = capture
+        self.frontier = list(frontier)
+        self.target_comments = target_comments
+        self.time_budget = time_budget
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.patience = patience
+        self.on_round = on_round  # Called after every round, e.g. to stream loaded comments
+        self.should_stop = should_stop
+
+        self.rounds = 0
+        self.clicks = 0
+        self.throttles = 0
+        self.comments = 0
+        self.reached_checkpoint = False
+        self.stop_reason: Optional[str] = None
+        self._throttled = 0  # 429 responses seen, bumped by the response listener
+
+    def _on_response(self, response):
+        if response.status == 429:
+            self._throttled += 1
+
+    def _count(self, step: dict) -> int:
+        return self.capture.count if self.capture else step['comments']
+
+    def _stop(self, step: dict) -> Optional[str]:
+        if (self.capture and self.capture.reached_checkpoint) or step['reachedFrontier']:
+            # Comments are listed newest first: the rest was scraped before
+            self.reached_checkpoint = True
+            return "checkpoint"
+        if self.target_comments and self.comments >= self.target_comments:
+            return "target"
+        if self.capture and self.capture.has_more is False:
+            return "end_of_list"  # The API said there is no next page
+        return None
+
+    async def _wait_for_mutations(self, previous: int, wait: float) -> bool:
+        try:
+            await self.page.wait_for_function(MUTATIONS_SINCE_JS, arg=previous, timeout=wait * 1000)
+            return True
+        except Exception:
+            return False
+
+    async def run(self) -> dict:
+        started = time.monotonic()
+        deadline = started + self.time_budget
+        wait = self.min_wait
+        throttle_pause = THROTTLE_PAUSE
+        idle_rounds = 0
+        errors = 0
+        seen_throttles = self._throttled
+        self.page.on("response", self._on_response)
+
+        try:
+            while True:
+                if time.monotonic() >= deadline:
+                    self.stop_reason = "time_budget"
+                    break
+                if self.should_stop and self.should_stop():
+                    self.stop_reason = "cancelled"
+                    break
+
+                self.rounds += 1
+                try:
+                    step = await self.page.evaluate(SCROLL_STEP_JS, {'frontier': self.frontier})
+                    errors = 0
+                except Exception as e:
+                    errors += 1
+                    print(f"\n  ⚠️  Erro na rodada {self.rounds}: {e}")
+                    if errors >= MAX_STEP_ERRORS:
+                        self.stop_reason = "error"
+                        break
+                    await asyncio.sleep(wait)
+                    continue
+
+                if step['clicked']:
+                    self.clicks += 1
+                self.comments = self._count(step)
+                print(f"\r  🔄 Rodada {self.rounds} | 💬 {self.comments} comentários | ⏱️  espera {wait * 1000:.0f} ms", end="", flush=True)
+
+                self.stop_reason = self._stop(step)
+                if self.stop_reason:
+                    break
+
+                progressed = await self._wait_for_mutations(step['mutations'], min(wait, max(deadline - time.monotonic(), 0)))
+                if self.capture:
+                    await self.capture.drain()
+                    progressed = progressed or self.capture.count > self.comments
+                if self.on_round:
+                    await self.on_round()
+
+                if self._throttled > seen_throttles:
+                    # Instagram is throttling: pause instead of scrolling into more 429s
+                    seen_throttles = self._throttled
+                    self.throttles += 1
+                    pause = min(throttle_pause, max(deadline - time.monotonic(), 0))
+                    print(f"\n  🐢 Instagram limitou as requisições, pausando {pause:.0f}s...")
+                    await asyncio.sleep(pause)
+                    throttle_pause = min(throttle_pause * 2, MAX_THROTTLE_PAUSE)
+                    idle_rounds = 0
+                    continue
+
+                if progressed:
+                    wait = self.min_wait
+                    throttle_pause = THROTTLE_PAUSE
+                    idle_rounds = 0
+                    continue
+
+                if wait < self.max_wait:
+                    wait = min(wait * 2, self.max_wait)
+                    continue
+
+                # Nothing changed after the longest wait: done only if nothing is still loading
+                if not step['loading'] and not step['clicked']:
+                    idle_rounds += 1
+                    if idle_rounds >= self.patience:
+                        self.stop_reason = "end_of_list"
+                        break
+        finally:
+            self.page.remove_listener("response", self._on_response)
+
+        if self.capture:
+            await self.capture.drain()
+            self.comments = self.capture.count
+        return self.stats(started)
+
+    def stats(self, started: float) -> dict:
+        return {
+            "stop_reason": self.stop_reason,
+            "rounds": self.rounds,
+            "comments": self.comments,
+            "load_more_clicks": self.clicks,
+            "throttles": self.throttles,
+            "duration_ms": round((time.monotonic() - started) * 1000)
+        }
@@ -0,0 +1,230 @@
+"""
+Incremental parsing of CSV, NDJSON and Instagram comment dump uploads
+Turns a request body stream into row dicts without buffering the whole payload
+"""
+
+import codecs
+import csv
+import heapq
+import json
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from bulk_import import BATCH_SIZE
+from comment_dump import CommentDumpParser
+from schemas import ImportSummaryResponse
+
+SUPPORTED_FORMATS = ("csv", "ndjson")
+
+# Only the first few row errors are echoed back in the summary
+MAX_REPORTED_ERRORS = 50
+
+CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/x-jsonlines": "ndjson",
+}
+
+
+class RowError(ValueError):
+    """A single malformed row in an upload"""
+
+    def __init__(self, line_num: int, message: str):
+        super().__init__(f"Linha {line_num}: {message}")
+        self.line_num = line_num
+
+
+def detect_format(fmt: Optional[str], content_type: Optional[str]) -> str:
+    """Resolve the upload format from the query parameter or the Content-Type header"""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}', use csv or ndjson")
+        return fmt
+    
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CONTENT_TYPE_FORMATS:
+        return CONTENT_TYPE_FORMATS[media_type]
+    raise ValueError("Could not detect upload format, pass ?format=csv or ?format=ndjson")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (line_number, line) pairs from a stream of byte chunks"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_num = 0
+    
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line_num += 1
+            yield line_num, line.rstrip("\r")
+    
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        line_num += 1
+        yield line_num, pending.rstrip("\r")
+
+
+async def iter_rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Yield (line_number, row) pairs parsed from an upload
+    Rows are dicts, or a RowError for lines that could not be parsed
+    """
+    if fmt == "ndjson":
+        async for line_num, line in iter_lines(chunks):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_num, RowError(line_num, f"JSON inválido ({e.msg})")
+                continue
+            if not isinstance(row, dict):
+                yield line_num, RowError(line_num, "esperado um objeto JSON")
+                continue
+            yield line_num, row
+        return
+    
+    header = None
+    record = ""
+    record_start = 0
+    async for line_num, line in iter_lines(chunks):
+        # A quoted field may span several physical lines: keep reading until quotes balance
+        if not record:
+            record_start = line_num
+            record = line
+        else:
+            record += "\n" + line
+        if record.count('"') % 2:
+            continue
+        
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield record_start, RowError(
+                record_start, f"esperadas {len(header)} colunas, encontradas {len(values)}"
+            )
+            continue
+        yield record_start, dict(zip(header, values))
+    
+    if record:
+        yield record_start, RowError(record_start, "aspas não fechadas")
+
+
+def clean_row(row: Dict) -> Dict:
+    """Drop empty CSV cells so optional fields fall back to their defaults"""
+    return {key: value for key, value in row.items() if value not in ("", None)}
+
+
+async def import_stream(
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    row_model: Type[BaseModel],
+    write_batch: Callable[[List[Tuple[int, BaseModel]]], Awaitable[Tuple[int, int, List[Tuple[int, str]]]]],
+    batch_size: int = BATCH_SIZE
+) -> ImportSummaryResponse:
+    """
+    Validate rows as they arrive and hand them to `write_batch` in bounded batches
+    `write_batch` is a coroutine function returning (inserted, skipped, [(line_number, error)])
+    """
+    summary = ImportSummaryResponse()
+    batch = []
+    # Errors from write_batch arrive after parse errors of later lines: keep the
+    # MAX_REPORTED_ERRORS first lines in a max-heap and report them in line order
+    reported: List[Tuple[int, str]] = []
+    
+    def record_error(error: RowError):
+        summary.invalid += 1
+        heapq.heappush(reported, (-error.line_num, str(error)))
+        if len(reported) > MAX_REPORTED_ERRORS:
+            heapq.heappop(reported)
+    
+    async def flush():
+        inserted, skipped, row_errors = await write_batch(batch)
+        summary.inserted += inserted
+        summary.skipped += skipped
+        summary.batches += 1
+        for line_num, message in row_errors:
+            record_error(RowError(line_num, message))
+        print(f"📥 Lote {summary.batches}: {summary.rows_read} linhas lidas, {summary.inserted} inseridas, {summary.skipped} ignoradas, {summary.invalid} inválidas")
+        batch.clear()
+    
+    async for line_num, row in iter_rows(chunks, fmt):
+        summary.rows_read += 1
+        if isinstance(row, RowError):
+            record_error(row)
+            continue
+        
+        try:
+            item = row_model(**clean_row(row))
+        except ValidationError as e:
+            first = e.errors()[0]
+            field = ".".join(str(part) for part in first["loc"])
+            record_error(RowError(line_num, f"{field}: {first['msg']}"))
+            continue
+        
+        batch.append((line_num, item))
+        if len(batch) >= batch_size:
+            await flush()
+    
+    if batch:
+        await flush()
+    
+    summary.errors = [message for _, message in sorted(reported, reverse=True)]
+    return summary
+
+
+async def import_comment_dump(
+    chunks: AsyncIterator[bytes],
+    write_batch: Callable[[List[Dict]], Awaitable[Tuple[int, int, List[Tuple[int, str]]]]],
+    reference: Optional[datetime] = None,
+    batch_size: int = BATCH_SIZE
+) -> ImportSummaryResponse:
+    """
+    Parse an uploaded dump as it arrives and hand comments to `write_batch` in bounded batches
+    rows_read counts comments; orphan lines are reported as invalid
+    """
+    parser = CommentDumpParser(reference)
+    summary = ImportSummaryResponse()
+    batch = []
+    
+    async def flush():
+        inserted, skipped, _ = await write_batch(batch)
+        summary.inserted += inserted
+        summary.skipped += skipped
+        summary.batches += 1
+        print(f"📥 Lote {summary.batches}: {summary.rows_read} comentários lidos, {summary.inserted} inseridos, {summary.skipped} ignorados")
+        batch.clear()
+    
+    async for _, line in iter_lines(chunks):
+        record = parser.feed(line)
+        if record:
+            summary.rows_read += 1
+            batch.append(record)
+            if len(batch) >= batch_size:
+                await flush()
+    
+    record = parser.close()
+    if record:
+        summary.rows_read += 1
+        batch.append(record)
+    if batch:
+        await flush()
+    
+    if parser.orphan_lines:
+        summary.invalid = parser.orphan_lines
+        summary.errors.append(f"{parser.orphan_lines} linhas fora de um comentário (registro incompleto no início?)")
+    return summary
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test the pasted comment dump parser on a trimmed backup.txt
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from comment_dump import CommentDumpParser
+from stream_import import import_comment_dump
+
+SAMPLE = Path(__file__).parent / "test_data" / "backup_sample.txt"
+REFERENCE = datetime(2025, 1, 10, 12, 0)
+
+
+def parse_sample():
+    parser = CommentDumpParser(REFERENCE)
+    records = []
+    with open(SAMPLE, encoding="utf-8") as f:
+        for line in f:
+            record = parser.feed(line.rstrip("\r\n"))
+            if record:
+                records.append(record)
+    record = parser.close()
+    if record:
+        records.append(record)
+    return parser, records
+
+
+def test_records_and_stats():
+    parser, records = parse_sample()
+
+    assert [record['username'] for record in records] == [
+        "mayaradreadful", "queenofthemayhem", "mayaradreadful", "mayaradreadful",
+        "mjohnatan", "mjohnatan", "mjohnatan", "julia_vitoria_oliveira2001",
+    ]
+    assert records[0]['tagged_users'] == ["r_e_n_a_n___"]
+    assert records[0]['relative_time'] == "3 d"
+    assert records[0]['created_at'] == REFERENCE - timedelta(days=3)
+
+    # The paste starts mid-record: its time and text lines belong to no comment
+    assert parser.stats() == {"lines": 43, "comments": 8, "hidden": 1, "orphan_lines": 2}
+
+
+def test_hidden_comments_follow_marker():
+    _, records = parse_sample()
+
+    assert [record['username'] for record in records if record['hidden']] == ["julia_vitoria_oliveira2001"]
+    assert records[-1]['tagged_users'] == ["germanovsjulia"]
+
+
+def test_record_without_text_is_dropped():
+    parser = CommentDumpParser(REFERENCE)
+    for line in ["Foto do perfil de someone", "someone", " ", "7 h"]:
+        assert parser.feed(line) is None
+
+    assert parser.close() is None
+    assert parser.stats()["comments"] == 0
+
+
+def test_import_reports_orphan_lines():
+    async def chunks():
+        data = SAMPLE.read_bytes()
+        for start in range(0, len(data), 64):
+            yield data[start:start + 64]
+
+    written = []
+
+    async def write_batch(batch):
+        written.extend(record['username'] for record in batch)
+        return len(batch), 0, []
+
+    summary = asyncio.run(import_comment_dump(chunks(), write_batch, REFERENCE, batch_size=3))
+
+    assert summary.rows_read == 8
+    assert summary.inserted == 8
+    assert summary.batches == 3
+    assert summary.invalid == 2
+    assert len(written) == 8
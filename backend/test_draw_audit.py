@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test the entries digest under concurrent writers
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import func, select
+
+from models import InstagramRaffle, InstagramParticipant
+from bulk_import import write_instagram_comment_batch
+from draw_audit import EMPTY_DIGEST, compute_instagram_digest
+
+WRITERS = 4
+BATCHES = 10
+BATCH_SIZE = 100
+
+
+def test_concurrent_writers_keep_digest(session_factory):
+    """Writers on the same raffle must not lose each other's digest updates"""
+    Session = session_factory
+
+    with Session() as db:
+        raffle = InstagramRaffle(post_url="https://instagram.com/p/test", shortcode="test", entries_digest=EMPTY_DIGEST, entries_count=0)
+        db.add(raffle)
+        db.commit()
+        raffle_id = raffle.id
+
+    errors = []
+
+    def write(writer: int):
+        try:
+            with Session() as db:
+                for batch in range(BATCHES):
+                    write_instagram_comment_batch(db, raffle_id, [
+                        {'username': f"user_{writer}_{batch}_{i}", 'text': "@friend", 'tagged_users': ["friend"]}
+                        for i in range(BATCH_SIZE)
+                    ])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    with Session() as db:
+        raffle = db.get(InstagramRaffle, raffle_id)
+        rows = db.scalar(select(func.count()).where(InstagramParticipant.raffle_id == raffle_id))
+        assert rows == WRITERS * BATCHES * BATCH_SIZE
+        assert (raffle.entries_digest, raffle.entries_count) == compute_instagram_digest(db, raffle_id)
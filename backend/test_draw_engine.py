@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test winner selection on the database
+"""
+
+import random
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import delete, insert
+
+import draw_engine
+from draw_engine import draw_instagram_winners, draw_ticket_winners, sample_rows
+from models import InstagramRaffle, InstagramParticipant, Participant, Raffle, Ticket
+
+
+def add_instagram_raffle(db, usernames):
+    raffle = InstagramRaffle(post_url="https://instagram.com/p/test", shortcode="test")
+    db.add(raffle)
+    db.flush()
+    db.execute(insert(InstagramParticipant), [
+        {"raffle_id": raffle.id, "username": username, "comment_text": "@friend", "tagged_users": ["friend"]}
+        for username in usernames
+    ])
+    db.commit()
+    return raffle.id
+
+
+def add_ticket_raffle(db, tickets_per_participant):
+    """One participant per entry of `tickets_per_participant`, holding that many tickets"""
+    raffle = Raffle(name="Test")
+    db.add(raffle)
+    participants = [Participant(name=f"P{i}", email=f"p{i}@example.com") for i in range(len(tickets_per_participant))]
+    db.add_all(participants)
+    db.flush()
+    number = 0
+    rows = []
+    for participant, tickets in zip(participants, tickets_per_participant):
+        for _ in range(tickets):
+            number += 1
+            rows.append({"raffle_id": raffle.id, "participant_id": participant.id, "ticket_number": str(number)})
+    db.execute(insert(Ticket), rows)
+    db.commit()
+    return raffle.id, [participant.id for participant in participants]
+
+
+def test_sample_rows_distinct_winners(session_factory):
+    with session_factory() as db:
+        raffle_id = add_instagram_raffle(db, [f"user{i}" for i in range(50)])
+
+        for seed in range(20):
+            drawn, total = sample_rows(db, InstagramParticipant, InstagramParticipant.raffle_id == raffle_id, k=10, rng=random.Random(seed))
+            assert total == 50
+            assert len(drawn) == 10
+            assert len({row.id for row in drawn}) == 10
+
+        # Asking for more winners than rows returns every row once
+        drawn, total = sample_rows(db, InstagramParticipant, InstagramParticipant.raffle_id == raffle_id, k=80, rng=random.Random(1))
+        assert sorted(row.username for row in drawn) == sorted(f"user{i}" for i in range(50))
+
+
+def test_sample_rows_is_replayable(session_factory):
+    with session_factory() as db:
+        raffle_id = add_instagram_raffle(db, [f"user{i}" for i in range(30)])
+
+        first, _, _ = draw_instagram_winners(db, raffle_id, 5, rng=random.Random("seed"))
+        second, _, _ = draw_instagram_winners(db, raffle_id, 5, rng=random.Random("seed"))
+        assert [row.id for row in first] == [row.id for row in second]
+
+
+def test_sample_rows_with_rows_deleted_after_count(session_factory, monkeypatch):
+    """Rows deleted between the count and the offset scan give fewer winners, not an error"""
+    with session_factory() as db:
+        raffle_id = add_instagram_raffle(db, [f"user{i}" for i in range(10)])
+        count_rows = draw_engine.count_rows
+
+        def count_then_delete(db, model, *criteria):
+            total = count_rows(db, model, *criteria)
+            db.execute(delete(InstagramParticipant).where(InstagramParticipant.username.in_(["user7", "user8", "user9"])))
+            return total
+
+        monkeypatch.setattr(draw_engine, "count_rows", count_then_delete)
+        drawn, total = sample_rows(db, InstagramParticipant, InstagramParticipant.raffle_id == raffle_id, k=10, rng=random.Random(3))
+
+        assert total == 10
+        assert sorted(row.username for row in drawn) == [f"user{i}" for i in range(7)]
+
+
+def test_ticket_winners_are_distinct_participants(session_factory):
+    with session_factory() as db:
+        raffle_id, participant_ids = add_ticket_raffle(db, [5, 1, 3, 2, 4])
+
+        for seed in range(20):
+            tickets, eligible = draw_ticket_winners(db, raffle_id, 3, weighted=True, rng=random.Random(seed))
+            assert eligible == 5
+            assert len({ticket.participant_id for ticket in tickets}) == 3
+
+
+def test_weighted_draw_favours_more_tickets(session_factory):
+    """With weighting a 99-ticket participant almost always wins; without it, about half the time"""
+    with session_factory() as db:
+        raffle_id, (heavy, light) = add_ticket_raffle(db, [99, 1])
+
+        weighted_wins = sum(
+            draw_ticket_winners(db, raffle_id, 1, weighted=True, rng=random.Random(seed))[0][0].participant_id == heavy
+            for seed in range(200)
+        )
+        equal_wins = sum(
+            draw_ticket_winners(db, raffle_id, 1, weighted=False, rng=random.Random(seed))[0][0].participant_id == heavy
+            for seed in range(200)
+        )
+
+        assert weighted_wins >= 190
+        assert 70 <= equal_wins <= 130
+
+
+def test_weighted_multi_winner_order(session_factory):
+    """The first prize of a weighted multi-winner draw also follows the ticket counts"""
+    with session_factory() as db:
+        raffle_id, (heavy, _, _) = add_ticket_raffle(db, [98, 1, 1])
+
+        first_prizes = sum(
+            draw_ticket_winners(db, raffle_id, 2, weighted=True, rng=random.Random(seed))[0][0].participant_id == heavy
+            for seed in range(200)
+        )
+        assert first_prizes >= 185
+
+
+def test_max_winners_is_enforced():
+    """Draw endpoints reject more than MAX_WINNERS winners before touching the database"""
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    too_many = draw_engine.MAX_WINNERS + 1
+    assert client.post(f"/api/raffles/1/draw?winners={too_many}").status_code == 422
+    assert client.post(f"/api/instagram/raffles/1/draw?winners={too_many}").status_code == 422
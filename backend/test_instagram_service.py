@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Test that validation workers don't share an Instaloader context
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from instagram_service import InstagramService
+
+
+def test_validation_workers_use_their_own_context(monkeypatch):
+    service = InstagramService()
+    contexts = {}
+    barrier = threading.Barrier(3)
+
+    def validate(username, tagged_users, **rules):
+        # Keep every worker busy until all three have started
+        barrier.wait(timeout=5)
+        contexts[threading.current_thread().name] = service._context()
+        return True, []
+
+    monkeypatch.setattr(service, "validate_participant", validate)
+    results = list(service.validate_many([(i, f"user{i}", ["friend"]) for i in range(3)], workers=3))
+
+    assert sorted(key for key, _, _ in results) == [0, 1, 2]
+    assert len(contexts) == 3
+    assert len({id(context) for context in contexts.values()}) == 3
+    assert service.loader.context not in contexts.values()
+    assert service._context() is service.loader.context
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test the streaming CSV/NDJSON upload parser
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from schemas import TicketAssignment
+from stream_import import RowError, import_stream, iter_rows
+
+
+async def as_chunks(data: bytes, size: int):
+    """Split a payload into small chunks, as a request body arrives"""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def parse(data: bytes, fmt: str, size: int = 7):
+    async def collect():
+        return [row async for row in iter_rows(as_chunks(data, size), fmt)]
+    return asyncio.run(collect())
+
+
+def test_csv_multiline_quoted_field_and_bom():
+    data = '\ufeffname,email,phone\n"Ana\nMaria",ana@example.com,1\nBia,bia@example.com,2\n'.encode("utf-8")
+    rows = parse(data, "csv")
+
+    assert rows == [
+        (2, {"name": "Ana\nMaria", "email": "ana@example.com", "phone": "1"}),
+        (4, {"name": "Bia", "email": "bia@example.com", "phone": "2"}),
+    ]
+
+
+def test_csv_bad_rows_are_reported():
+    data = b'participant_id,ticket_number\n1,10\n2\n3,"30\n'
+    rows = parse(data, "csv")
+
+    assert rows[0] == (2, {"participant_id": "1", "ticket_number": "10"})
+    assert isinstance(rows[1][1], RowError) and rows[1][0] == 3
+    assert isinstance(rows[2][1], RowError) and "aspas" in str(rows[2][1])
+
+
+def test_ndjson_bad_lines():
+    data = b'{"participant_id": 1, "ticket_number": "1"}\n\nnot json\n[1, 2]\n{"participant_id": 2, "ticket_number": "2"}'
+    rows = parse(data, "ndjson", size=5)
+
+    assert [line_num for line_num, _ in rows] == [1, 3, 4, 5]
+    assert rows[0][1] == {"participant_id": 1, "ticket_number": "1"}
+    assert isinstance(rows[1][1], RowError) and str(rows[1][1]).startswith("Linha 3: JSON inválido")
+    assert isinstance(rows[2][1], RowError) and "objeto JSON" in str(rows[2][1])
+    assert rows[3][1] == {"participant_id": 2, "ticket_number": "2"}
+
+
+def test_import_errors_in_line_order():
+    """Errors found while writing a batch are reported among the parse errors by line number"""
+    data = (
+        b'participant_id,ticket_number\n'
+        b'1,1\n'
+        b'999,2\n'
+        b'x,3\n'
+        b'2,4\n'
+        b'bad\n'
+    )
+
+    async def write_batch(batch):
+        errors = [(line_num, f"Participant {row.participant_id} not found") for line_num, row in batch if row.participant_id == 999]
+        return len(batch) - len(errors), 0, errors
+
+    summary = asyncio.run(import_stream(as_chunks(data, 8), "csv", TicketAssignment, write_batch, batch_size=10))
+
+    assert summary.rows_read == 5
+    assert summary.inserted == 2
+    assert summary.invalid == 3
+    assert [error.split(":")[0] for error in summary.errors] == ["Linha 3", "Linha 4", "Linha 6"]
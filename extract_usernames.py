@@ -1,23 +1,214 @@
+#!/usr/bin/env python3
+"""
+Extract Instagram @usernames from text files and export them for import
+
+Streams every input line by line (files or stdin), normalizes and
+de-duplicates usernames in first-seen order and writes base.txt, CSV or NDJSON.
+For inputs too large for an in-memory set, --disk-dedupe keeps the seen
+usernames in a SQLite file instead. The file is cleared on every run unless
+--resume is given, which keeps it and appends only new usernames to the output.
+
+Usage:
+  python extract_usernames.py                              # base.py -> base.txt
+  python extract_usernames.py dump1.txt dump2.txt -o participants.csv
+  cat dump.txt | python extract_usernames.py - -o - --format ndjson
+  python extract_usernames.py huge.txt --disk-dedupe seen.db
+  python extract_usernames.py more.txt --disk-dedupe seen.db --resume
+"""
+
+import argparse
+import csv
+import json
+import os
 import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO, Tuple
+
+ROOT = Path(__file__).parent
+DEFAULT_INPUT = ROOT / 'base.py'
+DEFAULT_OUTPUT = ROOT / 'base.txt'
+
+# Pattern: @ followed by alphanumeric characters, dots, and underscores
+MENTION_PATTERN = re.compile(r'@([a-zA-Z0-9._]+)')
+MAX_USERNAME_LENGTH = 30
+FORMATS = ('txt', 'csv', 'ndjson')
+DISK_COMMIT_EVERY = 10000
+
+
+def normalize_username(username: str) -> Optional[str]:
+    """Lowercase, without the trailing dots of "@user." at the end of a sentence"""
+    username = username.rstrip('.').lower()
+    if not username or len(username) > MAX_USERNAME_LENGTH:
+        return None
+    return username
+
+
+class MemorySeen:
+    def __init__(self):
+        self.seen = set()
+
+    def add(self, username: str) -> bool:
+        """True the first time a username is added"""
+        if username in self.seen:
+            return False
+        self.seen.add(username)
+        return True
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class DiskSeen:
+    """
+    Seen usernames in a SQLite table, for inputs with more usernames than fit in memory
+    Inserts are only committed by commit(), once their rows are written, so an
+    interrupted --resume run does not skip usernames missing from its output
+    """
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.db = sqlite3.connect(str(path))
+        self.db.execute('CREATE TABLE IF NOT EXISTS seen (username TEXT PRIMARY KEY) WITHOUT ROWID')
+        if not resume:
+            # A previous run's usernames would all count as already seen
+            self.db.execute('DELETE FROM seen')
+        self.db.commit()
+
+    def add(self, username: str) -> bool:
+        cursor = self.db.execute('INSERT OR IGNORE INTO seen (username) VALUES (?)', (username,))
+        return cursor.rowcount == 1
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        # Uncommitted inserts are rolled back
+        self.db.close()
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.lines = 0
+        self.mentions = 0
+        self.unique = 0
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f"📊 {self.lines} lines, {self.mentions} mentions, {self.unique} unique usernames "
+            f"in {elapsed:.2f}s ({self.lines / elapsed:,.0f} lines/sec)"
+        )
+
+
+def open_inputs(paths: Iterable[str]) -> Iterator[Tuple[str, TextIO]]:
+    for path in paths:
+        if path == '-':
+            yield '<stdin>', sys.stdin
+        else:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                yield path, f
+
+
+def extract(paths: Iterable[str], seen, stats: Stats) -> Iterator[Tuple[str, str, int]]:
+    """Yield (username, source, line number) for each username's first mention"""
+    for source, f in open_inputs(paths):
+        print(f"📂 Reading from: {source}", file=sys.stderr)
+        for line_num, line in enumerate(f, 1):
+            stats.lines += 1
+            for match in MENTION_PATTERN.findall(line):
+                stats.mentions += 1
+                username = normalize_username(match)
+                if username and seen.add(username):
+                    stats.unique += 1
+                    yield username, source, line_num
+
+
+def checkpointed(rows: Iterator[Tuple[str, str, int]], out: TextIO, seen) -> Iterator[Tuple[str, str, int]]:
+    """Commit the seen usernames every DISK_COMMIT_EVERY rows, after flushing the rows written so far"""
+    for count, row in enumerate(rows, 1):
+        yield row
+        # Resumed only once the writer has written this row
+        if count % DISK_COMMIT_EVERY == 0:
+            out.flush()
+            seen.commit()
+
+
+def write_output(rows: Iterable[Tuple[str, str, int]], out: TextIO, fmt: str, header: bool = True):
+    if fmt == 'txt':
+        for username, _, _ in rows:
+            out.write(username + '\n')
+    elif fmt == 'csv':
+        writer = csv.writer(out)
+        if header:
+            writer.writerow(['username', 'source', 'line'])
+        writer.writerows(rows)
+    else:
+        for username, source, line_num in rows:
+            out.write(json.dumps({'username': username, 'source': source, 'line': line_num}) + '\n')
+
+
+def detect_format(fmt: Optional[str], output: str) -> str:
+    if fmt:
+        return fmt
+    suffix = Path(output).suffix.lower().lstrip('.')
+    if suffix in ('jsonl', 'ndjson'):
+        return 'ndjson'
+    return suffix if suffix in FORMATS else 'txt'
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('inputs', nargs='*', help=f"files to read, '-' for stdin (default: {DEFAULT_INPUT.name})")
+    parser.add_argument('-o', '--output', default=str(DEFAULT_OUTPUT), help="output file, '-' for stdout")
+    parser.add_argument('--format', choices=FORMATS, help='txt, csv or ndjson (default: from the output extension)')
+    parser.add_argument('--disk-dedupe', type=Path, metavar='PATH', help='keep seen usernames in this SQLite file (cleared on start)')
+    parser.add_argument('--resume', action='store_true', help='keep the --disk-dedupe usernames of earlier runs and append to the output')
+    args = parser.parse_args(argv)
+    if args.resume and not args.disk_dedupe:
+        parser.error('--resume requires --disk-dedupe')
+
+    inputs = args.inputs or [str(DEFAULT_INPUT)]
+    # Check inputs before the output is truncated
+    missing = [path for path in inputs if path != '-' and not Path(path).is_file()]
+    if missing:
+        print(f"❌ File not found: {', '.join(missing)}", file=sys.stderr)
+        return 1
 
-# Read the base.py file
-with open('base.py', 'r', encoding='utf-8') as f:
-    content = f.read()
+    fmt = detect_format(args.format, args.output)
+    seen = DiskSeen(args.disk_dedupe, args.resume) if args.disk_dedupe else MemorySeen()
+    stats = Stats()
 
-# Find all usernames that start with @
-usernames = re.findall(r'@([a-zA-Z0-9._]+)', content)
+    try:
+        rows = extract(inputs, seen, stats)
+        if args.output == '-':
+            write_output(checkpointed(rows, sys.stdout, seen), sys.stdout, fmt)
+            sys.stdout.flush()
+        else:
+            # A resumed run adds to the output of the earlier ones instead of truncating it
+            appending = args.resume and Path(args.output).is_file() and Path(args.output).stat().st_size > 0
+            with open(args.output, 'a' if appending else 'w', encoding='utf-8', newline='') as out:
+                write_output(checkpointed(rows, out, seen), out, fmt, header=not appending)
+        seen.commit()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`): stop quietly, and keep Python's
+        # exit-time flush of stdout from failing again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        print(stats.report(), file=sys.stderr)
+        return 0
+    finally:
+        seen.close()
 
-# Remove duplicates while preserving order
-seen = set()
-unique_usernames = []
-for username in usernames:
-    if username not in seen:
-        seen.add(username)
-        unique_usernames.append(username)
+    if args.output != '-':
+        print(f"✅ Successfully exported to: {args.output} ({fmt})", file=sys.stderr)
+    print(stats.report(), file=sys.stderr)
+    return 0
 
-# Write to base.txt
-with open('base.txt', 'w', encoding='utf-8') as f:
-    for username in unique_usernames:
-        f.write(username + '\n')
 
-print(f'Exported {len(unique_usernames)} unique usernames to base.txt')
+if __name__ == '__main__':
+    sys.exit(main())
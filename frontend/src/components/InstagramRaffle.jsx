@@ -1,5 +1,8 @@
 import { useState, useEffect } from 'react';
-import { instagramAPI } from '../services/api';
+import { instagramAPI, jobsAPI } from '../services/api';
+
+// Only raffles created from a post link can be scraped
+const POST_URL_PATTERN = /instagram\.com\/p\/[A-Za-z0-9_-]+/;
 
 export default function InstagramRaffle() {
     const [raffles, setRaffles] = useState([]);
@@ -71,13 +74,34 @@ export default function InstagramRaffle() {
         }
     };
 
+    const handleImportFile = async (raffleId) => {
+        setScraping(true);
+        setError(null);
+
+        try {
+            const result = await instagramAPI.importFile(raffleId);
+            setSuccess(`✅ ${result.inserted} participantes importados de base.txt!`);
+            loadParticipants(raffleId);
+            loadRaffles();
+            setTimeout(() => setSuccess(null), 3000);
+        } catch (err) {
+            setError(err.message);
+        } finally {
+            setScraping(false);
+        }
+    };
+
     const handleScrapePost = async (raffleId) => {
         setScraping(true);
         setError(null);
 
         try {
-            const result = await instagramAPI.scrapePost(raffleId);
-            setSuccess(`✅ ${result.participants_found} participantes coletados!`);
+            const job = await instagramAPI.scrapePost(raffleId);
+            const result = await jobsAPI.wait(job.id, (progress) => {
+                setSuccess(`⏳ ${progress.result?.participants_found || 0} participantes coletados...`);
+            });
+            if (result.status === 'failed') throw new Error(result.error || 'Failed to scrape Instagram post');
+            setSuccess(`✅ ${result.result?.participants_found || 0} participantes coletados!`);
             loadParticipants(raffleId);
             loadRaffles();
             setTimeout(() => setSuccess(null), 3000);
@@ -158,21 +182,21 @@ export default function InstagramRaffle() {
             {/* Create Raffle Form */}
             <div className="card animate-fadeIn">
                 <h2>📸 Criar Sorteio</h2>
-                <p>Configure o sorteio (participantes serão importados de base.txt)</p>
+                <p>Configure o sorteio (participantes serão importados de base.txt, ou coletados do post se você informar o link dele)</p>
 
                 {error && <div className="alert alert-error">❌ {error}</div>}
                 {success && <div className="alert alert-success">{success}</div>}
 
                 <form onSubmit={handleCreateRaffle}>
                     <div className="input-group">
-                        <label htmlFor="post-url" className="input-label">Nome do Sorteio</label>
+                        <label htmlFor="post-url" className="input-label">Nome do Sorteio ou Link do Post</label>
                         <input
                             type="text"
                             id="post-url"
                             className="input"
                             value={formData.post_url}
                             onChange={(e) => setFormData({ ...formData, post_url: e.target.value })}
-                            placeholder="Nome do sorteio..."
+                            placeholder="Nome do sorteio ou link do post (https://www.instagram.com/p/...)"
                             required
                         />
                     </div>
@@ -213,13 +237,23 @@ export default function InstagramRaffle() {
                                     {raffle.status === 'collecting' && (
                                         <button
                                             className="btn btn-primary"
-                                            onClick={(e) => { e.stopPropagation(); handleScrapePost(raffle.id); }}
+                                            onClick={(e) => { e.stopPropagation(); handleImportFile(raffle.id); }}
                                             disabled={scraping}
                                         >
                                             {scraping ? '⏳ Importando...' : '📥 Importar Participantes'}
                                         </button>
                                     )}
 
+                                    {raffle.status === 'collecting' && POST_URL_PATTERN.test(raffle.post_url) && (
+                                        <button
+                                            className="btn btn-secondary"
+                                            onClick={(e) => { e.stopPropagation(); handleScrapePost(raffle.id); }}
+                                            disabled={scraping}
+                                        >
+                                            {scraping ? '⏳ Coletando...' : '🔎 Coletar do Post'}
+                                        </button>
+                                    )}
+
                                     {raffle.status === 'validating' && (
                                         <button
                                             className="btn btn-primary"
@@ -116,6 +116,18 @@ export const instagramAPI = {
         return response.json();
     },
 
+    // Import participants from base.txt on the server
+    importFile: async (raffleId) => {
+        const response = await fetch(`${API_BASE_URL}/instagram/raffles/${raffleId}/import-file`, {
+            method: 'POST',
+        });
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Failed to import participants');
+        }
+        return response.json();
+    },
+
     scrapePost: async (raffleId) => {
         const response = await fetch(`${API_BASE_URL}/instagram/raffles/${raffleId}/scrape`, {
             method: 'POST',
@@ -203,3 +215,42 @@ export const instagramAPI = {
         return response.json();
     },
 };
+
+// Background Job API
+export const jobsAPI = {
+    get: async (jobId) => {
+        const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+        if (!response.ok) throw new Error('Failed to fetch job');
+        return response.json();
+    },
+
+    cancel: async (jobId) => {
+        const response = await fetch(`${API_BASE_URL}/jobs/${jobId}/cancel`, {
+            method: 'POST'
+        });
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Failed to cancel job');
+        }
+        return response.json();
+    },
+
+    eventsUrl: (jobId) => `${API_BASE_URL}/jobs/${jobId}/events`,
+
+    // Follow a job's progress until it finishes, resolves with the final job
+    wait: (jobId, onProgress) => new Promise((resolve, reject) => {
+        const source = new EventSource(`${API_BASE_URL}/jobs/${jobId}/events`);
+        source.onmessage = (event) => {
+            const job = JSON.parse(event.data);
+            if (onProgress) onProgress(job);
+            if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+                source.close();
+                resolve(job);
+            }
+        };
+        source.onerror = () => {
+            source.close();
+            reject(new Error('Lost connection to job progress'));
+        };
+    }),
+};